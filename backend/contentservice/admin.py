@@ -1,8 +1,22 @@
 from django.contrib import admin
-from .models import SpeciesImage
+from .models import SpeciesImage, SpeciesName, SpeciesProfile
 
 
 @admin.register(SpeciesImage)
 class SpeciesImageAdmin(admin.ModelAdmin):
     list_display = ('scientific_name', 'filename')
-    search_fields = ('scientific_name', 'filename')
\ No newline at end of file
+    search_fields = ('scientific_name', 'filename')
+
+
+@admin.register(SpeciesName)
+class SpeciesNameAdmin(admin.ModelAdmin):
+    list_display = ('scientific_name', 'kingdom', 'family', 'source')
+    search_fields = ('scientific_name', 'common_names_es')
+    list_filter = ('kingdom', 'source')
+
+
+@admin.register(SpeciesProfile)
+class SpeciesProfileAdmin(admin.ModelAdmin):
+    list_display = ('scientific_name', 'kingdom', 'family', 'conservation_status', 'place', 'refreshed_at')
+    search_fields = ('scientific_name', 'common_name')
+    list_filter = ('kingdom', 'place', 'conservation_status')
\ No newline at end of file
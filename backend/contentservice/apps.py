@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class ContentserviceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'contentservice'
\ No newline at end of file
+    name = 'contentservice'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,266 @@
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.core.cache import caches
+
+from naturein import http_client
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se agrupa dentro del worker
+    fcntl = None
+
+
+_MISSING = object()
+_RAISE = object()
+_lock = threading.Lock()
+_counters = defaultdict(lambda: {'hits': 0, 'negative_hits': 0, 'misses': 0, 'errors': 0, 'coalesced': 0, 'coalesced_remote': 0})
+_failures = contextvars.ContextVar('upstream_failures', default=None)
+LOCK_STRIPES = 1024
+LOCK_POLL = 0.05
+
+
+def _store():
+    return caches['upstream']
+
+
+def _count(source, field):
+    with _lock:
+        _counters[source][field] += 1
+
+
+def _failed(source):
+    _count(source, 'errors')
+    failed = _failures.get()
+    if failed is not None:
+        failed.append(source)
+
+
+@contextmanager
+def failures():
+    """
+    Fuentes que fallaron dentro del bloque (la consulta devolvió su
+    ``fallback`` o propagó el error). Viaja en una contextvar, así que
+    incluye los hilos de ``fan_out``.
+    """
+    failed = []
+    token = _failures.set(failed)
+    try:
+        yield failed
+    finally:
+        _failures.reset(token)
+
+
+def make_key(source, name, args, kwargs=None):
+    raw = json.dumps([args, kwargs or {}], sort_keys=True, default=str, ensure_ascii=False)
+    return f"{source}:{name}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+
+def ttl_for(source, value):
+    # Caché negativa: respuestas vacías se guardan con un TTL más corto
+    if not value:
+        return settings.UPSTREAM_CACHE_NEGATIVE_TTL
+    return settings.UPSTREAM_CACHE_TTLS.get(source, settings.UPSTREAM_CACHE_DEFAULT_TTL)
+
+
+class _Flight:
+    __slots__ = ('done', 'value', 'error', 'expires')
+
+    def __init__(self, budget):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        # Fin del presupuesto del líder: su timeout no es el de quienes esperan
+        self.expires = budget.expires if budget else None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _wait_limit():
+    budget = http_client.current_budget()
+    return min(settings.UPSTREAM_SINGLEFLIGHT_WAIT, budget.remaining()) if budget else settings.UPSTREAM_SINGLEFLIGHT_WAIT
+
+
+def _across_workers(source, key, fetch, recheck):
+    """
+    Cerrojo entre workers con flock sobre un archivo por franja de claves.
+    Si otro proceso tenía el cerrojo, al obtenerlo se vuelve a mirar la caché
+    antes de consultar el servicio. Pasada la espera máxima se consulta igual.
+    """
+    if fcntl is None:
+        return fetch()
+    stripe = int(key.rsplit(':', 1)[-1][:8], 16) % LOCK_STRIPES
+    try:
+        lock_dir = Path(settings.UPSTREAM_LOCK_DIR)
+        lock_dir.mkdir(parents=True, exist_ok=True)
+        fd = os.open(lock_dir / f'{stripe}.lock', os.O_CREAT | os.O_RDWR, 0o644)
+    except OSError:
+        return fetch()
+    try:
+        waited = False
+        give_up = time.monotonic() + _wait_limit()
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= give_up:
+                    return fetch()
+                waited = True
+                time.sleep(LOCK_POLL)
+        try:
+            if waited:
+                value = recheck()
+                if value is not _MISSING:
+                    _count(source, 'coalesced_remote')
+                    return value
+            return fetch()
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def _leader_ran_out(flight, budget):
+    """El líder falló por su propio plazo y a quien espera le queda más tiempo."""
+    if not isinstance(flight.error, requests.Timeout) or flight.expires is None:
+        return False
+    return budget is None or (budget.expires > flight.expires and budget.remaining() > 0)
+
+
+def _singleflight(source, key, fetch, recheck):
+    """
+    Peticiones idénticas simultáneas comparten una sola llamada: la primera
+    consulta el servicio y las demás esperan su resultado (o su error). Si el
+    líder agotó un plazo más corto que el propio, quien espera consulta por su
+    cuenta; cualquier otro error compartido queda anotado en su presupuesto.
+    """
+    budget = http_client.current_budget()
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight(budget)
+    if not leader:
+        _count(source, 'coalesced')
+        if not flight.done.wait(_wait_limit()):
+            return fetch()
+        if flight.error is None:
+            return flight.value
+        if _leader_ran_out(flight, budget):
+            return _across_workers(source, key, fetch, recheck)
+        if budget is not None:
+            budget.record_shared_error(source)
+        raise flight.error
+    try:
+        flight.value = _across_workers(source, key, fetch, recheck)
+        return flight.value
+    except Exception as exc:
+        flight.error = exc
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def cached(source, fallback=_RAISE):
+    """
+    Memoiza una consulta a un servicio externo en la caché compartida
+    ``upstream`` (disco local, común a todos los workers y reinicios).
+    Los errores no se guardan: se devuelve ``fallback`` si se indicó o se
+    propaga la excepción. Las consultas idénticas simultáneas se agrupan en
+    una sola llamada (dentro del worker y entre workers).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(source, func.__name__, args, kwargs)
+            value = _store().get(key, _MISSING)
+            if value is not _MISSING:
+                _count(source, 'hits' if value else 'negative_hits')
+                return value
+            _count(source, 'misses')
+
+            def fetch():
+                value = func(*args, **kwargs)
+                _store().set(key, value, ttl_for(source, value))
+                return value
+            try:
+                return _singleflight(source, key, fetch, lambda: _store().get(key, _MISSING))
+            except Exception:
+                _failed(source)
+                if fallback is _RAISE:
+                    raise
+                return fallback
+        return wrapper
+    return decorator
+
+
+def cached_batch(source, fallback=''):
+    """
+    Variante de ``cached`` para funciones que reciben una lista y devuelven
+    {elemento: valor}. Cada elemento se guarda con su propia clave, así que
+    solo se consultan al servicio los que faltan. Los elementos que el
+    servicio no devuelve se guardan como ``fallback`` (caché negativa).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(items):
+            items = [item for item in dict.fromkeys(items) if item]
+            keys = {item: make_key(source, func.__name__, (item,)) for item in items}
+            found = _store().get_many(list(keys.values())) if keys else {}
+            result, missing = {}, []
+            for item, key in keys.items():
+                if key in found:
+                    _count(source, 'hits' if found[key] else 'negative_hits')
+                    result[item] = found[key]
+                else:
+                    _count(source, 'misses')
+                    missing.append(item)
+            if not missing:
+                return result
+
+            def fetch():
+                fetched = func(missing)
+                values = {item: fetched.get(item, fallback) for item in missing}
+                # Una escritura por TTL (positivas y negativas), no una por elemento
+                by_ttl = defaultdict(dict)
+                for item, value in values.items():
+                    by_ttl[ttl_for(source, value)][keys[item]] = value
+                for ttl, batch in by_ttl.items():
+                    _store().set_many(batch, ttl)
+                return values
+
+            def recheck():
+                found = _store().get_many([keys[item] for item in missing])
+                return {item: found[keys[item]] for item in missing} if len(found) == len(missing) else _MISSING
+            try:
+                result.update(_singleflight(source, make_key(source, func.__name__, (missing,)), fetch, recheck))
+            except Exception:
+                _failed(source)
+                result.update((item, fallback) for item in missing)
+            return result
+        return wrapper
+    return decorator
+
+
+def stats():
+    with _lock:
+        data = {source: dict(c) for source, c in _counters.items()}
+    for c in data.values():
+        lookups = c['hits'] + c['negative_hits'] + c['misses']
+        c['hit_ratio'] = round((c['hits'] + c['negative_hits']) / lookups, 3) if lookups else None
+    return data
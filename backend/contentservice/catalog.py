@@ -0,0 +1,238 @@
+"""
+Índice en memoria del catálogo local de especies (``SpeciesName``).
+
+Autocompletar responde desde aquí sin salir del proceso: prefijos por bisect
+sobre claves ordenadas, subcadenas y coincidencias aproximadas por trigramas.
+GBIF solo se consulta en segundo plano para ampliar el catálogo.
+"""
+import bisect
+import os
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+
+
+REFRESH_SECONDS = int(os.environ.get('SPECIES_CATALOG_REFRESH_SECONDS', '300'))
+GBIF_BACKFILL = os.environ.get('SPECIES_CATALOG_GBIF_BACKFILL', 'true').lower() == 'true'
+BACKFILL_WORKERS = int(os.environ.get('SPECIES_CATALOG_BACKFILL_WORKERS', '2'))
+FUZZY_MIN_SIMILARITY = 0.35
+# La búsqueda aproximada solo revisa los nombres que comparten los trigramas más raros
+FUZZY_PROBE_TRIGRAMS = 4
+FUZZY_MAX_CANDIDATES = 1500
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.lower().split())
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CatalogIndex:
+    def __init__(self, entries):
+        # entries: {nombre científico: [nombres comunes]}
+        self.names = []
+        self.keys = []
+        self.gram_counts = []
+        self.postings = defaultdict(set)
+        self.prefix_keys = []
+        for scientific, commons in entries.items():
+            self.add(scientific, commons, sort=False)
+        self.prefix_keys.sort()
+
+    def add(self, scientific, commons, sort=True):
+        idx = len(self.names)
+        self.names.append(scientific)
+        for term in [scientific, *commons]:
+            key = normalize(term)
+            if not key:
+                continue
+            kid = len(self.keys)
+            self.keys.append((key, idx))
+            grams = trigrams(key)
+            self.gram_counts.append(len(grams))
+            for g in grams:
+                self.postings[g].add(kid)
+            # Una clave por palabra: "terrestris" encuentra "Tapirus terrestris"
+            words = key.split(' ')
+            for w in range(len(words)):
+                entry = (' '.join(words[w:]), w, kid)
+                if sort:
+                    bisect.insort(self.prefix_keys, entry)
+                else:
+                    self.prefix_keys.append(entry)
+        return idx
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, q, limit=10):
+        ql = normalize(q)
+        if not ql:
+            return []
+        scored = {}
+
+        def offer(idx, score):
+            if score < scored.get(idx, (99,))[0]:
+                scored[idx] = (score, len(self.names[idx]), self.names[idx])
+
+        # 1) Prefijo del nombre completo o de alguna de sus palabras
+        pos = bisect.bisect_left(self.prefix_keys, (ql,))
+        while pos < len(self.prefix_keys) and len(scored) < limit * 4:
+            term, word_pos, kid = self.prefix_keys[pos]
+            if not term.startswith(ql):
+                break
+            key, idx = self.keys[kid]
+            offer(idx, 0 if key == ql else (1 if word_pos == 0 else 2))
+            pos += 1
+        if len(scored) >= limit or len(ql) < 3:
+            return self._ranked(scored, limit)
+
+        # 2) Subcadena: intersección de las listas de trigramas, de la más corta a la más larga
+        inner = sorted((self.postings.get(ql[i:i + 3], set()) for i in range(len(ql) - 2)), key=len)
+        candidates = set(inner[0])
+        for posting in inner[1:]:
+            if not candidates:
+                break
+            candidates &= posting
+        for kid in candidates:
+            key, idx = self.keys[kid]
+            if ql in key:
+                offer(idx, 3)
+        if len(scored) >= limit:
+            return self._ranked(scored, limit)
+
+        # 3) Aproximada: candidatos de los trigramas más raros, puntuados por similitud de Jaccard
+        qpostings = sorted((self.postings.get(g, set()) for g in trigrams(ql)), key=len)
+        candidates = set()
+        for posting in qpostings[:FUZZY_PROBE_TRIGRAMS]:
+            candidates.update(posting)
+            if len(candidates) > FUZZY_MAX_CANDIDATES:
+                break
+        for kid in candidates:
+            shared = sum(1 for posting in qpostings if kid in posting)
+            similarity = shared / (len(qpostings) + self.gram_counts[kid] - shared)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                offer(self.keys[kid][1], 4 + (1 - similarity))
+        return self._ranked(scored, limit)
+
+    def _ranked(self, scored, limit):
+        return [name for _, _, name in sorted(scored.values())[:limit]]
+
+
+_lock = threading.Lock()
+_index = None
+_built_at = 0.0
+_version = None
+_pending_backfill = set()
+_backfill_lock = threading.Lock()
+# Pool propio y acotado: ráfagas de autocompletado no ocupan el de fan_out (fichas).
+# Si está lleno el relleno se descarta, no se encola
+_backfill_executor = ThreadPoolExecutor(max_workers=BACKFILL_WORKERS, thread_name_prefix='catalog-backfill')
+
+
+def _catalog_version():
+    from .models import SpeciesName
+    return (
+        SpeciesName.objects.count(),
+        SpeciesName.objects.order_by('-pk').values_list('pk', flat=True).first(),
+    )
+
+
+def _build():
+    from .models import SpeciesName
+    from .repository import LOCAL_SPECIES
+    entries = {name: [] for name in LOCAL_SPECIES}
+    for scientific, commons in SpeciesName.objects.values_list('scientific_name', 'common_names_es').iterator(chunk_size=5000):
+        entries[scientific] = [n for n in (commons or '').split('|') if n]
+    return CatalogIndex(entries)
+
+
+def get_index():
+    global _index, _built_at, _version
+    if _index is not None and time.monotonic() - _built_at < REFRESH_SECONDS:
+        return _index
+    with _lock:
+        if _index is None or time.monotonic() - _built_at >= REFRESH_SECONDS:
+            version = _catalog_version()
+            if _index is None or version != _version:
+                _index = _build()
+                _version = version
+            _built_at = time.monotonic()
+    return _index
+
+
+def invalidate():
+    global _built_at, _version
+    with _lock:
+        _built_at = 0.0
+        _version = None
+
+
+def warm_up():
+    """Construye el índice en segundo plano al arrancar el worker."""
+    def _run():
+        try:
+            get_index()
+        except Exception:
+            pass
+        finally:
+            connection.close()
+    threading.Thread(target=_run, name='species-catalog-warmup', daemon=True).start()
+
+
+def _backfill_from_gbif(q, key, limit):
+    from .models import SpeciesName
+    from .repository import search_species_gbif
+    try:
+        gb = search_species_gbif({'limit': limit, 'q': q, 'rank': 'SPECIES'})
+        index = get_index()
+        known = set(index.names)
+        new = []
+        for r in gb.get('results', [])[:limit]:
+            name = r.get('canonicalName') or r.get('scientificName')
+            if not name or name in known:
+                continue
+            known.add(name)
+            new.append(SpeciesName(
+                scientific_name=name,
+                kingdom=r.get('kingdom') or '',
+                family=r.get('family') or '',
+                gbif_key=r.get('key'),
+                source='gbif',
+            ))
+        if new:
+            SpeciesName.objects.bulk_create(new, ignore_conflicts=True)
+            with _lock:
+                for row in new:
+                    index.add(row.scientific_name, [])
+    finally:
+        with _backfill_lock:
+            _pending_backfill.discard(key)
+        connection.close()
+
+
+def autocomplete(q, limit=10):
+    results = get_index().search(q, limit)
+    key = normalize(q)
+    if GBIF_BACKFILL and len(results) < limit and len(key) >= 3:
+        _schedule_backfill(q, key, limit)
+    return results
+
+
+def _schedule_backfill(q, key, limit):
+    """Lanza el relleno desde GBIF si no hay uno igual en curso y queda un hilo libre."""
+    with _backfill_lock:
+        if key in _pending_backfill or len(_pending_backfill) >= BACKFILL_WORKERS:
+            return False
+        _pending_backfill.add(key)
+    _backfill_executor.submit(_backfill_from_gbif, q, key, limit)
+    return True
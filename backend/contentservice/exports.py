@@ -0,0 +1,74 @@
+"""
+Exportación de especies a CSV en streaming.
+
+Las filas salen del catálogo local (``SpeciesName``) cuando está cargado y,
+si no hay catálogo o no contiene coincidencias, de la búsqueda de GBIF
+paginada con ``offset``. Nada se acumula en memoria: cada fila se escribe con
+el módulo csv y se entrega al ``StreamingHttpResponse`` según se genera.
+"""
+import csv
+import os
+
+from django.db.models import Q
+
+from .models import SpeciesName
+from .repository import search_species_gbif
+
+
+CSV_HEADER = ['id', 'nombre', 'rein']
+MAX_ROWS = int(os.environ.get('CSV_EXPORT_MAX_ROWS', '10000'))
+GBIF_PAGE_SIZE = 300
+DB_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de guardarla."""
+
+    def write(self, value):
+        return value
+
+
+def local_rows(query, limit):
+    qs = SpeciesName.objects.all()
+    if query:
+        qs = qs.filter(Q(scientific_name__icontains=query) | Q(common_names_es__icontains=query))
+    rows = qs.order_by('scientific_name').values_list('gbif_key', 'scientific_name', 'kingdom')[:limit]
+    for key, name, kingdom in rows.iterator(chunk_size=DB_CHUNK_SIZE):
+        yield [str(key or ''), name, kingdom]
+
+
+def gbif_rows(query, limit):
+    offset = 0
+    while offset < limit:
+        try:
+            page = search_species_gbif({'q': query, 'limit': min(GBIF_PAGE_SIZE, limit - offset), 'offset': offset})
+        except Exception:
+            # La cabecera ya se envió: se corta el archivo en la última fila completa
+            break
+        results = page.get('results') or []
+        for r in results:
+            yield [
+                str(r.get('key') or ''),
+                r.get('scientificName') or r.get('canonicalName') or '',
+                r.get('kingdom') or '',
+            ]
+        offset += len(results)
+        if not results or page.get('endOfRecords'):
+            break
+
+
+def species_rows(query, limit):
+    emitted = 0
+    for row in local_rows(query, limit):
+        emitted += 1
+        yield row
+    if not emitted:
+        yield from gbif_rows(query, limit)
+
+
+def csv_lines(query, limit=None):
+    limit = min(limit or MAX_ROWS, MAX_ROWS)
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for row in species_rows(query, limit):
+        yield writer.writerow(row)
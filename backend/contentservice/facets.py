@@ -0,0 +1,43 @@
+"""
+Facetas de alimentación y reproducción extraídas del texto de una ficha.
+
+Mismas reglas de palabras clave que usaba el filtro en vivo de generate_ficha;
+en ``SpeciesProfile`` se guardan como columnas indexadas para filtrar en SQL.
+"""
+
+FACET_KEYWORDS = {
+    'is_herbivore': ('herbív', 'herbiv'),
+    'is_carnivore': ('carnív', 'carniv'),
+    'is_omnivore': ('omnív', 'omniv'),
+    'reproduces_sexually': ('sexual', 'sexuada'),
+    'reproduces_asexually': ('asexual', 'apomix', 'bipartición', 'espor'),
+}
+
+
+def extract_facets(text):
+    text = (text or '').lower()
+    return {field: any(k in text for k in keywords) for field, keywords in FACET_KEYWORDS.items()}
+
+
+def facet_filter(alimentacion, reproduccion):
+    """Traduce los filtros de la petición a {columna: True}."""
+    filters = {}
+    if alimentacion.startswith('herb'):
+        filters['is_herbivore'] = True
+    elif alimentacion.startswith('carn'):
+        filters['is_carnivore'] = True
+    elif alimentacion.startswith('omní') or alimentacion.startswith('omni'):
+        filters['is_omnivore'] = True
+    if reproduccion.startswith('sexu'):
+        filters['reproduces_sexually'] = True
+    elif reproduccion.startswith('asex'):
+        filters['reproduces_asexually'] = True
+    return filters
+
+
+def matches_traits(text, alimentacion, reproduccion):
+    wanted = facet_filter(alimentacion, reproduccion)
+    if not wanted:
+        return True
+    facets = extract_facets(text)
+    return all(facets[field] for field in wanted)
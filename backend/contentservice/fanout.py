@@ -0,0 +1,46 @@
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from naturein import http_client
+
+
+# Pool compartido por todas las peticiones del worker: acota el número de
+# llamadas simultáneas a iNaturalist, GBIF, Wikipedia, Wikidata y EOL.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('CONTENT_FANOUT_WORKERS', '16')),
+    thread_name_prefix='content-fanout',
+)
+
+
+def submit(func, *args):
+    """Lanza una llamada en el pool con una copia del contexto (presupuesto incluido)."""
+    return _executor.submit(contextvars.copy_context().run, func, *args)
+
+
+def result(future, default=None):
+    """
+    Espera el resultado sin pasarse del presupuesto de ``http_client.budget``:
+    si se agota, la tarea se cancela (si no empezó) y se devuelve ``default``,
+    igual que si hubiera fallado.
+    """
+    budget = http_client.current_budget()
+    try:
+        return future.result(timeout=budget.remaining() if budget else None)
+    except TimeoutError:
+        future.cancel()
+        budget.exhausted = True
+        return default
+    except Exception:
+        return default
+
+
+def fan_out(calls, default=None):
+    """
+    Ejecuta en paralelo una lista de llamadas ``(func, *args)`` y devuelve sus
+    resultados en el mismo orden de entrada. Si una llamada falla o se agota el
+    presupuesto se devuelve ``default`` en su posición. No anidar: las tareas
+    no deben llamar a fan_out.
+    """
+    futures = [submit(*call) for call in calls]
+    return [result(future, default) for future in futures]
@@ -0,0 +1,172 @@
+"""
+Guías pedagógicas en PDF con caché por contenido.
+
+Cada PDF se guarda en disco bajo el hash de (especies, título, versión de la
+plantilla, versión de los datos). La versión de los datos cambia cuando se
+refresca alguna ficha, cuando cambia una imagen o cuando vence la caché de
+descripciones externas. El almacén tiene un tamaño máximo y expulsa primero
+los PDFs usados hace más tiempo (LRU por mtime).
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from .cache import failures
+from .fanout import fan_out
+from .models import SpeciesProfile
+from .repository import eol_search_title, wiki_summaries_es, wikidata_description_es, wikidata_descriptions_es
+from .thumbnails import print_derivative
+
+
+# Subir al cambiar el diseño del PDF para invalidar los ya generados
+TEMPLATE_VERSION = 1
+CACHE_DIR = Path(os.environ.get('PDF_GUIDE_CACHE_DIR', str(Path(settings.BASE_DIR) / 'cache' / 'guides')))
+CACHE_MAX_BYTES = int(os.environ.get('PDF_GUIDE_CACHE_MAX_MB', '200')) * 1024 * 1024
+
+DEFAULT_SPECIES = ['Tapirus terrestris', 'Pecari tajacu', 'Rupicola peruvianus', 'Cedrela odorata', 'Ficus elastica']
+DEFAULT_TITLE = 'Guía pedagógica NatureIn'
+
+
+def data_version(species, images):
+    profiles = SpeciesProfile.objects.filter(scientific_name__in=species).values_list('scientific_name', 'refreshed_at')
+    parts = sorted(f'{name}:{refreshed.isoformat()}' for name, refreshed in profiles)
+    for name in species:
+        img = images.get(name)
+        try:
+            parts.append(f'{name}:{img.path}:{img.path.stat().st_mtime_ns}' if img else f'{name}:-')
+        except OSError:
+            parts.append(f'{name}:-')
+    # Las descripciones salen de la caché de upstream: no pueden ser más nuevas que su TTL
+    parts.append(str(int(time.time() // settings.UPSTREAM_CACHE_DEFAULT_TTL)))
+    return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def guide_key(species, title, images):
+    raw = json.dumps([species, title, TEMPLATE_VERSION, data_version(species, images)], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _path(key):
+    return CACHE_DIR / f'{key}.pdf'
+
+
+def load(key):
+    path = _path(key)
+    try:
+        data = path.read_bytes()
+        # Marca de uso reciente para la expulsión LRU
+        os.utime(path)
+    except OSError:
+        return None
+    return data
+
+
+def store(key, pdf):
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(pdf)
+        os.replace(tmp, _path(key))
+        evict()
+    except OSError:
+        pass
+
+
+def evict(max_bytes=None):
+    """Borra los PDFs menos usados hasta quedar bajo el límite de tamaño."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    try:
+        with os.scandir(CACHE_DIR) as it:
+            for entry in it:
+                if entry.name.endswith('.pdf'):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+    except OSError:
+        return 0
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def _fallback_description(name):
+    return wikidata_description_es(name) or eol_search_title(name)
+
+
+def _descriptions(species):
+    """Wikidata, si no EOL y si no Wikipedia; Wikidata y Wikipedia van por lotes."""
+    by_title, summaries = fan_out([(wikidata_descriptions_es, species), (wiki_summaries_es, species)], default={})
+    missing = [name for name in species if not by_title.get(name)]
+    fallback = dict(zip(missing, fan_out([(_fallback_description, name) for name in missing], default='')))
+    return [by_title.get(name) or fallback.get(name) or summaries.get(name) or '' for name in species]
+
+
+def render_guide(species, title, images):
+    """Devuelve (pdf, completo); ``completo`` es False si alguna consulta de descripción falló."""
+    with failures() as failed:
+        descriptions = _descriptions(species)
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    width, height = A4
+    c.setTitle(title)
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(40, height - 60, title)
+    c.setFont("Helvetica", 10)
+    c.drawString(40, height - 80, "Selección de especies para actividades y trivia")
+    y = height - 110
+
+    for name, desc in zip(species, descriptions):
+        if y < 120:
+            c.showPage()
+            y = height - 60
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(40, y, name)
+        y -= 16
+        # Descripción (Wikidata/EOL/Wikipedia)
+        c.setFont("Helvetica", 10)
+        for line in (desc or "Sin descripción disponible").split('\n'):
+            c.drawString(40, y, (line[:110] + ('…' if len(line) > 110 else '')))
+            y -= 14
+            if y < 120:
+                c.showPage(); y = height - 60
+        # Imagen estática si existe
+        resolved = images.get(name)
+        scaled = print_derivative(resolved.path, 200, 140) if resolved else None
+        if scaled:
+            try:
+                img = ImageReader(str(scaled))
+                c.drawImage(img, 40, y - 140, width=200, height=140, preserveAspectRatio=True, mask='auto')
+                y -= 160
+            except Exception:
+                pass
+        # Separador
+        c.line(40, y, width - 40, y)
+        y -= 20
+
+    c.showPage()
+    c.save()
+    pdf = buf.getvalue()
+    buf.close()
+    return pdf, not failed
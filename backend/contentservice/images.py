@@ -0,0 +1,95 @@
+"""
+Resolución de imágenes de especies en lote.
+
+Una sola consulta a ``SpeciesImage`` por lote de nombres y un manifiesto en
+memoria de los archivos presentes en ``static/species`` y ``MEDIA_ROOT/species``,
+de modo que nunca se devuelven URLs de archivos inexistentes.
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+from django.conf import settings
+
+from .models import SpeciesImage
+from .thumbnails import thumbnail_url
+
+
+# Otros workers no reciben nuestras señales: el manifiesto también caduca por tiempo
+MANIFEST_TTL = int(os.environ.get('SPECIES_IMAGE_MANIFEST_TTL', '60'))
+
+
+class ResolvedImage(NamedTuple):
+    url: str
+    path: Path
+
+
+def static_dir():
+    return Path(settings.BASE_DIR) / 'static' / 'species'
+
+
+def media_dir():
+    return Path(settings.MEDIA_ROOT) / 'species'
+
+
+def slug_filename(name):
+    return (name or '').lower().replace(' ', '_') + '.jpg'
+
+
+def _list_files(directory):
+    try:
+        return {entry.name for entry in os.scandir(directory) if entry.is_file()}
+    except OSError:
+        return set()
+
+
+_lock = threading.Lock()
+_manifest = None
+_manifest_at = 0.0
+
+
+def refresh_manifest():
+    global _manifest, _manifest_at
+    manifest = {
+        'static': frozenset(_list_files(static_dir())),
+        'media': frozenset(f'species/{name}' for name in _list_files(media_dir())),
+    }
+    with _lock:
+        _manifest = manifest
+        _manifest_at = time.monotonic()
+    return manifest
+
+
+def get_manifest():
+    if _manifest is None or time.monotonic() - _manifest_at > MANIFEST_TTL:
+        return refresh_manifest()
+    return _manifest
+
+
+def resolve_images(names):
+    """Devuelve {nombre: ResolvedImage | None} para todos los nombres con una sola consulta."""
+    names = [n for n in dict.fromkeys(names) if n]
+    records = {r.scientific_name: r for r in SpeciesImage.objects.filter(scientific_name__in=names)}
+    manifest = get_manifest()
+    resolved = {}
+    for name in names:
+        rec = records.get(name)
+        image_name = rec.image.name if rec and rec.image else ''
+        filename = rec.filename if rec and rec.filename else slug_filename(name)
+        if image_name in manifest['media']:
+            resolved[name] = ResolvedImage(f'{settings.MEDIA_URL}{image_name}', Path(settings.MEDIA_ROOT) / image_name)
+        elif filename in manifest['static']:
+            resolved[name] = ResolvedImage(f'/static/species/{filename}', static_dir() / filename)
+        else:
+            resolved[name] = None
+    return resolved
+
+
+def image_fields(names):
+    """{nombre: {'imageUrl', 'thumbnailUrl'}} para las respuestas JSON."""
+    return {
+        name: {'imageUrl': img.url if img else None, 'thumbnailUrl': thumbnail_url(img.path) if img else None}
+        for name, img in resolve_images(names).items()
+    }
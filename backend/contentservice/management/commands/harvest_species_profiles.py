@@ -0,0 +1,35 @@
+"""
+Cosecha las fichas de especies del lugar configurado (iNaturalist + GBIF +
+Wikipedia + Wikidata) en ``SpeciesProfile``. Pensado para ejecutarse
+periódicamente (cron); con --stale-only solo refresca las filas vencidas.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from contentservice.profiles import DEFAULT_PLACE, harvest_place, refresh_profiles, stale_profiles
+
+
+class Command(BaseCommand):
+    help = 'Materializa las fichas de especies del lugar configurado en la tabla SpeciesProfile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--place', default=DEFAULT_PLACE)
+        parser.add_argument('--per-kingdom', type=int, default=200)
+        parser.add_argument('--stale-only', action='store_true', help='Solo refrescar fichas vencidas')
+        parser.add_argument('--batch', type=int, default=50)
+
+    def handle(self, *args, **options):
+        if options['stale_only']:
+            total = 0
+            while True:
+                batch = list(stale_profiles(options['batch']))
+                if not batch:
+                    break
+                total += refresh_profiles(batch)
+                self.stdout.write(f'Refrescadas {total} fichas')
+            self.stdout.write(self.style.SUCCESS(f'Fichas vencidas refrescadas: {total}'))
+            return
+        try:
+            total = harvest_place(options['place'], options['per_kingdom'], log=self.stdout.write)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"Fichas materializadas para {options['place']}: {total}"))
@@ -0,0 +1,108 @@
+"""
+Importa el catálogo local de nombres de especies desde un volcado de GBIF
+(Backbone DwC-A: Taxon.tsv + VernacularName.tsv) o de iNaturalist
+(DwC-A: taxa.csv + VernacularNames-spanish.csv).
+"""
+import csv
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from contentservice.models import SpeciesName
+
+
+BATCH_SIZE = 1000
+
+
+def _reader(path):
+    handle = open(path, newline='', encoding='utf-8')
+    first = handle.readline()
+    handle.seek(0)
+    return handle, csv.DictReader(handle, delimiter='\t' if '\t' in first else ',', quoting=csv.QUOTE_NONE if '\t' in first else csv.QUOTE_MINIMAL)
+
+
+def _taxon_id(row):
+    # iNat usa "id" numérico y "taxonID" como URL; GBIF solo "taxonID"
+    return (row.get('id') or row.get('taxonID') or '').strip()
+
+
+class Command(BaseCommand):
+    help = 'Importa nombres científicos y comunes en español desde un volcado de GBIF o iNaturalist'
+
+    def add_arguments(self, parser):
+        parser.add_argument('taxa', help='Archivo de taxones (Taxon.tsv de GBIF o taxa.csv de iNaturalist)')
+        parser.add_argument('--vernacular', help='Archivo de nombres vernáculos (VernacularName.tsv / VernacularNames-spanish.csv)')
+        parser.add_argument('--source', choices=['gbif', 'inat'], default='gbif')
+        parser.add_argument('--kingdom', action='append', default=None, help='Reinos a importar (repetible). Por defecto Plantae y Animalia')
+        parser.add_argument('--rank', default='species')
+        parser.add_argument('--language', default='es')
+
+    def handle(self, *args, **options):
+        csv.field_size_limit(sys.maxsize)
+        kingdoms = {k.lower() for k in (options['kingdom'] or ['Plantae', 'Animalia'])}
+        rank = options['rank'].lower()
+        source = options['source']
+
+        commons = {}
+        if options['vernacular']:
+            language = options['language'].lower()
+            handle, reader = _reader(options['vernacular'])
+            with handle:
+                for row in reader:
+                    lang = (row.get('language') or '').lower()
+                    if lang and lang not in (language, 'spa', 'spanish', 'español'):
+                        continue
+                    name = (row.get('vernacularName') or '').strip().replace('|', ' ')
+                    if name:
+                        names = commons.setdefault(_taxon_id(row), [])
+                        if name not in names:
+                            names.append(name)
+            self.stdout.write(f'Nombres vernáculos leídos para {len(commons)} taxones')
+
+        try:
+            handle, reader = _reader(options['taxa'])
+        except OSError as exc:
+            raise CommandError(str(exc))
+        batch, total = [], 0
+        with handle:
+            for row in reader:
+                if (row.get('taxonRank') or '').lower() != rank:
+                    continue
+                if (row.get('kingdom') or '').lower() not in kingdoms:
+                    continue
+                if (row.get('taxonomicStatus') or 'accepted').lower() not in ('accepted', 'active', 'true'):
+                    continue
+                name = (row.get('canonicalName') or row.get('scientificName') or '').strip()
+                if not name:
+                    continue
+                taxon_id = _taxon_id(row)
+                batch.append(SpeciesName(
+                    scientific_name=name[:200],
+                    common_names_es='|'.join(commons.get(taxon_id, [])),
+                    kingdom=row.get('kingdom') or '',
+                    family=(row.get('family') or '')[:100],
+                    gbif_key=int(taxon_id) if source == 'gbif' and taxon_id.isdigit() else None,
+                    inat_id=int(taxon_id) if source == 'inat' and taxon_id.isdigit() else None,
+                    source=source,
+                ))
+                if len(batch) >= BATCH_SIZE:
+                    total += self._save(batch, source)
+                    batch = []
+        if batch:
+            total += self._save(batch, source)
+        self.stdout.write(self.style.SUCCESS(f'Catálogo actualizado: {total} especies importadas'))
+
+    def _save(self, batch, source):
+        id_field = 'gbif_key' if source == 'gbif' else 'inat_id'
+        unique = {row.scientific_name: row for row in batch}
+        # Sin nombres vernáculos no se pisan los importados desde otra fuente
+        for with_commons in (True, False):
+            rows = [row for row in unique.values() if bool(row.common_names_es) == with_commons]
+            if rows:
+                SpeciesName.objects.bulk_create(
+                    rows,
+                    update_conflicts=True,
+                    unique_fields=['scientific_name'],
+                    update_fields=(['common_names_es'] if with_commons else []) + ['kingdom', 'family', id_field, 'source'],
+                )
+        return len(unique)
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.3 on 2026-10-18 15:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contentservice', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpeciesName',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scientific_name', models.CharField(max_length=200, unique=True)),
+                ('common_names_es', models.TextField(blank=True)),
+                ('kingdom', models.CharField(blank=True, max_length=32)),
+                ('family', models.CharField(blank=True, max_length=100)),
+                ('gbif_key', models.BigIntegerField(blank=True, null=True)),
+                ('inat_id', models.BigIntegerField(blank=True, null=True)),
+                ('source', models.CharField(blank=True, max_length=16)),
+            ],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.3 on 2026-10-18 15:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contentservice', '0002_speciesname'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpeciesProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scientific_name', models.CharField(max_length=200, unique=True)),
+                ('place', models.CharField(db_index=True, max_length=100)),
+                ('inat_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('gbif_key', models.BigIntegerField(blank=True, null=True)),
+                ('kingdom', models.CharField(blank=True, max_length=32)),
+                ('family', models.CharField(blank=True, max_length=100)),
+                ('common_name', models.CharField(blank=True, max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('wikipedia_summary', models.TextField(blank=True)),
+                ('wikidata_description', models.CharField(blank=True, max_length=500)),
+                ('conservation_status', models.CharField(blank=True, max_length=16)),
+                ('observations_count', models.IntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['place', 'kingdom', '-observations_count'], name='contentserv_place_89acee_idx'), models.Index(fields=['family'], name='contentserv_family_4dc807_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.1.3 on 2026-10-18 15:26
+
+from django.db import migrations, models
+
+
+FACET_KEYWORDS = {
+    'is_herbivore': ('herbív', 'herbiv'),
+    'is_carnivore': ('carnív', 'carniv'),
+    'is_omnivore': ('omnív', 'omniv'),
+    'reproduces_sexually': ('sexual', 'sexuada'),
+    'reproduces_asexually': ('asexual', 'apomix', 'bipartición', 'espor'),
+}
+
+
+def extract_facets(apps, schema_editor):
+    SpeciesProfile = apps.get_model('contentservice', 'SpeciesProfile')
+    rows = list(SpeciesProfile.objects.only('id', 'description'))
+    for row in rows:
+        text = (row.description or '').lower()
+        for field, keywords in FACET_KEYWORDS.items():
+            setattr(row, field, any(k in text for k in keywords))
+    SpeciesProfile.objects.bulk_update(rows, list(FACET_KEYWORDS), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contentservice', '0003_speciesprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='speciesprofile',
+            name='is_carnivore',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='speciesprofile',
+            name='is_herbivore',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='speciesprofile',
+            name='is_omnivore',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='speciesprofile',
+            name='reproduces_asexually',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='speciesprofile',
+            name='reproduces_sexually',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='speciesprofile',
+            index=models.Index(fields=['place', 'conservation_status'], name='contentserv_place_9be058_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='speciesprofile',
+            index=models.Index(fields=['place', 'is_herbivore', 'is_carnivore', 'is_omnivore'], name='contentserv_place_605c69_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='speciesprofile',
+            index=models.Index(fields=['place', 'reproduces_sexually', 'reproduces_asexually'], name='contentserv_place_b62fde_idx'),
+        ),
+        migrations.RunPython(extract_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.3 on 2026-10-18 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contentservice', '0004_speciesprofile_facets'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='speciesprofile',
+            name='scientific_name',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+        migrations.AlterUniqueTogether(
+            name='speciesprofile',
+            unique_together={('scientific_name', 'place')},
+        ),
+    ]
@@ -7,4 +7,57 @@ class SpeciesImage(models.Model):
     image = models.ImageField(upload_to='species/', blank=True, null=True)
 
     def __str__(self):
-        return self.scientific_name
\ No newline at end of file
+        return self.scientific_name
+
+class SpeciesName(models.Model):
+    """Catálogo local de nombres (científico y comunes en español) para autocompletar."""
+    scientific_name = models.CharField(max_length=200, unique=True)
+    common_names_es = models.TextField(blank=True)
+    kingdom = models.CharField(max_length=32, blank=True)
+    family = models.CharField(max_length=100, blank=True)
+    gbif_key = models.BigIntegerField(null=True, blank=True)
+    inat_id = models.BigIntegerField(null=True, blank=True)
+    source = models.CharField(max_length=16, blank=True)
+
+    def common_names(self):
+        return [n for n in self.common_names_es.split('|') if n]
+
+    def __str__(self):
+        return self.scientific_name
+
+
+class SpeciesProfile(models.Model):
+    """Ficha de especie materializada desde iNaturalist, GBIF, Wikipedia y Wikidata."""
+    # Una fila por especie y lugar: la misma especie puede cosecharse en varios lugares
+    scientific_name = models.CharField(max_length=200, db_index=True)
+    place = models.CharField(max_length=100, db_index=True)
+    inat_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    gbif_key = models.BigIntegerField(null=True, blank=True)
+    kingdom = models.CharField(max_length=32, blank=True)
+    family = models.CharField(max_length=100, blank=True)
+    common_name = models.CharField(max_length=200, blank=True)
+    description = models.TextField(blank=True)
+    wikipedia_summary = models.TextField(blank=True)
+    wikidata_description = models.CharField(max_length=500, blank=True)
+    conservation_status = models.CharField(max_length=16, blank=True)
+    observations_count = models.IntegerField(default=0)
+    refreshed_at = models.DateTimeField(db_index=True)
+    # Facetas precalculadas (ver contentservice.facets)
+    is_herbivore = models.BooleanField(default=False)
+    is_carnivore = models.BooleanField(default=False)
+    is_omnivore = models.BooleanField(default=False)
+    reproduces_sexually = models.BooleanField(default=False)
+    reproduces_asexually = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['place', 'kingdom', '-observations_count']),
+            models.Index(fields=['family']),
+            models.Index(fields=['place', 'conservation_status']),
+            models.Index(fields=['place', 'is_herbivore', 'is_carnivore', 'is_omnivore']),
+            models.Index(fields=['place', 'reproduces_sexually', 'reproduces_asexually']),
+        ]
+        unique_together = ('scientific_name', 'place')
+
+    def __str__(self):
+        return self.scientific_name
@@ -0,0 +1,170 @@
+"""
+Materialización de fichas de especies (``SpeciesProfile``).
+
+La cosecha recorre los taxones de iNaturalist del lugar configurado y los
+enriquece con GBIF, Wikipedia y Wikidata; ``generate_ficha`` sirve después
+desde la tabla y solo refresca en segundo plano las filas vencidas.
+"""
+import os
+import threading
+from datetime import timedelta
+from urllib.parse import unquote
+
+from django.db import connection
+from django.utils import timezone
+
+from .facets import FACET_KEYWORDS, extract_facets
+from .fanout import fan_out
+from .models import SpeciesProfile
+from .repository import find_place_id, search_taxa_inat, inat_taxa_by_ids, gbif_match, wiki_summaries_es, wikidata_descriptions_es
+
+
+KINGDOM_MAP = {'Plantae': 47126, 'Animalia': 1}
+DEFAULT_PLACE = os.environ.get('SPECIES_PROFILE_PLACE', 'Tingo María')
+MAX_AGE = timedelta(days=int(os.environ.get('SPECIES_PROFILE_MAX_AGE_DAYS', '7')))
+REFRESH_BATCH = 10
+
+
+def taxon_status_code(taxon):
+    cs = taxon.get('conservation_status') or {}
+    if cs.get('status'):
+        return cs['status'].upper()
+    for cs2 in (taxon.get('conservation_statuses') or []):
+        if cs2.get('status'):
+            return cs2['status'].upper()
+    return None
+
+
+def wikipedia_title(taxon):
+    wp = taxon.get('wikipedia_url') or ''
+    return unquote(wp.split('/')[-1]).replace('_', ' ') if wp else ''
+
+
+def _enrich(taxa):
+    # Wikipedia y Wikidata por lotes; GBIF no tiene consulta por lotes
+    names = [t.get('name') for t in taxa]
+    calls = [(gbif_match, name) for name in names]
+    calls += [(wiki_summaries_es, [wikipedia_title(t) for t in taxa]), (wikidata_descriptions_es, names)]
+    *matches, summaries, descriptions = fan_out(calls)
+    summaries, descriptions = summaries or {}, descriptions or {}
+    return [
+        (match, summaries.get(wikipedia_title(t), ''), descriptions.get(t.get('name'), ''))
+        for t, match in zip(taxa, matches)
+    ]
+
+
+def upsert_profiles(taxa, place, kingdom=''):
+    """Guarda (o actualiza) un lote de taxones de iNaturalist enriquecidos."""
+    taxa = [t for t in taxa if t.get('name')]
+    now = timezone.now()
+    # Si una fuente falla en el refresco se conserva el texto ya guardado
+    existing = {p.scientific_name: p for p in SpeciesProfile.objects.filter(place=place, scientific_name__in=[t['name'] for t in taxa])}
+    rows = []
+    for t, (match, wp_summary, wd_description) in zip(taxa, _enrich(taxa)):
+        old = existing.get(t['name'])
+        match = match or {}
+        wp_summary = wp_summary or t.get('wikipedia_summary') or (old.wikipedia_summary if old else '')
+        wd_description = wd_description or (old.wikidata_description if old else '')
+        description = wp_summary or wd_description or ''
+        rows.append(SpeciesProfile(
+            scientific_name=t['name'][:200],
+            place=place,
+            inat_id=t.get('id'),
+            gbif_key=match.get('usageKey') or (old.gbif_key if old else None),
+            kingdom=match.get('kingdom') or kingdom,
+            family=(match.get('family') or (old.family if old else ''))[:100],
+            common_name=(t.get('preferred_common_name') or '')[:200],
+            description=description,
+            wikipedia_summary=wp_summary,
+            wikidata_description=(wd_description or '')[:500],
+            conservation_status=taxon_status_code(t) or '',
+            observations_count=t.get('observations_count') or 0,
+            refreshed_at=now,
+            **extract_facets(description),
+        ))
+    SpeciesProfile.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['scientific_name', 'place'],
+        update_fields=[
+            'inat_id', 'gbif_key', 'kingdom', 'family', 'common_name', 'description',
+            'wikipedia_summary', 'wikidata_description', 'conservation_status', 'observations_count', 'refreshed_at',
+            *FACET_KEYWORDS,
+        ],
+    )
+    return len(rows)
+
+
+def harvest_place(place=DEFAULT_PLACE, per_kingdom=200, page_size=100, log=None):
+    place_id = find_place_id(place)
+    if not place_id:
+        raise ValueError(f'Lugar no encontrado en iNaturalist: {place}')
+    total = 0
+    for kingdom, taxon_id in KINGDOM_MAP.items():
+        fetched, page = 0, 1
+        while fetched < per_kingdom:
+            taxa = search_taxa_inat({
+                'place_id': place_id,
+                'taxon_id': taxon_id,
+                'rank': 'species',
+                'is_active': True,
+                'locale': 'es',
+                'order_by': 'observations_count',
+                'per_page': min(page_size, per_kingdom - fetched),
+                'page': page,
+            })
+            if not taxa:
+                break
+            total += upsert_profiles(taxa, place, kingdom)
+            fetched += len(taxa)
+            page += 1
+            if log:
+                log(f'{kingdom}: {fetched} especies')
+    return total
+
+
+def stale_profiles(limit=None):
+    qs = SpeciesProfile.objects.filter(refreshed_at__lt=timezone.now() - MAX_AGE).order_by('refreshed_at')
+    return qs[:limit] if limit else qs
+
+
+def refresh_profiles(profiles):
+    """Vuelve a consultar iNaturalist para las fichas vencidas y las actualiza."""
+    profiles = list(profiles)
+    # Las fichas con id de iNaturalist se piden juntas; el resto se busca por nombre
+    by_name = [p for p in profiles if not p.inat_id]
+    calls = [(inat_taxa_by_ids, [p.inat_id for p in profiles if p.inat_id])]
+    calls += [(search_taxa_inat, {'q': p.scientific_name, 'rank': 'species', 'locale': 'es', 'per_page': 1}) for p in by_name]
+    by_id, *results = fan_out(calls)
+    by_id, searched = by_id or {}, dict(zip((p.pk for p in by_name), results))
+    groups, missing = {}, []
+    for profile in profiles:
+        taxa = [by_id.get(profile.inat_id)] if profile.inat_id else searched.get(profile.pk)
+        taxon = next((t for t in (taxa or []) if t and t.get('name') == profile.scientific_name), None)
+        if taxon:
+            groups.setdefault((profile.place, profile.kingdom), []).append(taxon)
+        else:
+            missing.append(profile.pk)
+    refreshed = sum(upsert_profiles(taxa, place, kingdom) for (place, kingdom), taxa in groups.items())
+    # Las no encontradas se reintentan más adelante, sin bloquear a las demás
+    SpeciesProfile.objects.filter(pk__in=missing).update(refreshed_at=timezone.now() - MAX_AGE / 2)
+    return refreshed
+
+
+_refresh_lock = threading.Lock()
+
+
+def schedule_stale_refresh():
+    """Refresca en un hilo aparte un lote pequeño de fichas vencidas."""
+    if not _refresh_lock.acquire(blocking=False):
+        return
+
+    def _run():
+        try:
+            refresh_profiles(stale_profiles(REFRESH_BATCH))
+        except Exception:
+            pass
+        finally:
+            _refresh_lock.release()
+            connection.close()
+    threading.Thread(target=_run, name='species-profile-refresh', daemon=True).start()
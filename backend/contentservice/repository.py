@@ -1,5 +1,5 @@
-import requests
-from functools import lru_cache
+from naturein import http_client
+from .cache import cached, cached_batch
 
 
 LOCAL_SPECIES = [
@@ -11,68 +11,123 @@ LOCAL_SPECIES = [
 ]
 
 
-@lru_cache(maxsize=128)
+@cached('inat')
 def find_place_id(place_query: str) -> int | None:
-    r = requests.get('https://api.inaturalist.org/v1/places/autocomplete', params={'q': place_query, 'per_page': 1}, timeout=5)
+    r = http_client.get('https://api.inaturalist.org/v1/places/autocomplete', params={'q': place_query, 'per_page': 1}, timeout=5)
+    r.raise_for_status()
     data = r.json()
     return ((data.get('results') or [{}])[0]).get('id')
 
 
+@cached('inat')
 def search_taxa_inat(params: dict) -> list[dict]:
-    r = requests.get('https://api.inaturalist.org/v1/taxa', params=params, timeout=5)
+    r = http_client.get('https://api.inaturalist.org/v1/taxa', params=params, timeout=5)
+    r.raise_for_status()
     return (r.json().get('results') or [])
 
 
+@cached('gbif')
 def search_species_gbif(params: dict) -> dict:
-    r = requests.get('https://api.gbif.org/v1/species/search', params=params, timeout=5)
+    r = http_client.get('https://api.gbif.org/v1/species/search', params=params, timeout=5)
+    r.raise_for_status()
     return r.json()
 
 
+@cached('gbif')
 def gbif_match(name: str) -> dict:
-    return requests.get('https://api.gbif.org/v1/species/match', params={'name': name}, timeout=5).json()
+    r = http_client.get('https://api.gbif.org/v1/species/match', params={'name': name}, timeout=5)
+    r.raise_for_status()
+    return r.json()
 
 
+@cached('wikipedia', fallback='')
 def wiki_summary_es(title: str) -> str:
-    try:
-        r = requests.get(f'https://es.wikipedia.org/api/rest_v1/page/summary/{title}', timeout=5)
-        return r.json().get('extract') or ''
-    except Exception:
+    r = http_client.get(f'https://es.wikipedia.org/api/rest_v1/page/summary/{title}', timeout=5)
+    if r.status_code == 404:
         return ''
+    r.raise_for_status()
+    return r.json().get('extract') or ''
 
 
+@cached('wikidata', fallback='')
 def wikidata_description_es(name: str) -> str:
-    try:
-        r = requests.get('https://www.wikidata.org/w/api.php', params={'action': 'wbsearchentities', 'search': name, 'language': 'es', 'format': 'json', 'limit': 1}, timeout=5)
-        return ((r.json().get('search') or [{}])[0]).get('description') or ''
-    except Exception:
-        return ''
+    r = http_client.get('https://www.wikidata.org/w/api.php', params={'action': 'wbsearchentities', 'search': name, 'language': 'es', 'format': 'json', 'limit': 1}, timeout=5)
+    r.raise_for_status()
+    return ((r.json().get('search') or [{}])[0]).get('description') or ''
 
 
+@cached('eol', fallback='')
 def eol_search_title(name: str) -> str:
-    try:
-        r = requests.get('https://eol.org/api/search/1.0.json', params={'q': name}, timeout=5)
-        items = r.json().get('results') or []
-        return (items[0].get('title') if items else '') or ''
-    except Exception:
-        return ''
+    r = http_client.get('https://eol.org/api/search/1.0.json', params={'q': name}, timeout=5)
+    r.raise_for_status()
+    items = r.json().get('results') or []
+    return (items[0].get('title') if items else '') or ''
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+@cached_batch('inat', fallback={})
+def inat_taxa_by_ids(ids: list[int]) -> dict[int, dict]:
+    """Taxones completos de iNaturalist (hasta 30 por petición)."""
+    taxa = {}
+    for chunk in _chunks(ids, 30):
+        r = http_client.get(f"https://api.inaturalist.org/v1/taxa/{','.join(str(i) for i in chunk)}", params={'locale': 'es'}, timeout=5)
+        r.raise_for_status()
+        taxa.update((t.get('id'), t) for t in (r.json().get('results') or []))
+    return taxa
+
+
+@cached_batch('wikipedia')
+def wiki_summaries_es(titles: list[str]) -> dict[str, str]:
+    """Primer párrafo de la introducción de varios artículos por petición."""
+    summaries = {}
+    for chunk in _chunks(titles, 20):
+        r = http_client.get('https://es.wikipedia.org/w/api.php', params={
+            'action': 'query', 'prop': 'extracts', 'exintro': 1, 'explaintext': 1, 'exlimit': 'max',
+            'redirects': 1, 'titles': '|'.join(chunk), 'format': 'json', 'formatversion': 2,
+        }, timeout=5)
+        r.raise_for_status()
+        query = r.json().get('query') or {}
+        renames = {n['from']: n['to'] for n in (query.get('normalized') or []) + (query.get('redirects') or [])}
+        pages = {p.get('title'): p.get('extract') or '' for p in (query.get('pages') or [])}
+        for title in chunk:
+            resolved = renames.get(title, title)
+            resolved = renames.get(resolved, resolved)
+            extract = pages.get(resolved) or ''
+            summaries[title] = next((para for para in extract.split('\n') if para.strip()), '')
+    return summaries
+
+
+@cached_batch('wikidata')
+def wikidata_descriptions_es(names: list[str]) -> dict[str, str]:
+    """
+    Descripciones en español buscando las entidades por título de artículo
+    (eswiki y luego enwiki). Los nombres sin artículo quedan fuera: quien llama
+    puede recurrir a ``wikidata_description_es``.
+    """
+    descriptions = {}
+    pending = list(names)
+    for site in ('eswiki', 'enwiki'):
+        for chunk in _chunks(pending, 50):
+            r = http_client.get('https://www.wikidata.org/w/api.php', params={
+                'action': 'wbgetentities', 'sites': site, 'titles': '|'.join(chunk), 'props': 'descriptions|sitelinks',
+                'languages': 'es', 'sitefilter': site, 'format': 'json',
+            }, timeout=5)
+            r.raise_for_status()
+            for entity in (r.json().get('entities') or {}).values():
+                title = ((entity.get('sitelinks') or {}).get(site) or {}).get('title')
+                value = ((entity.get('descriptions') or {}).get('es') or {}).get('value')
+                if title and value:
+                    descriptions[title] = value
+        pending = [name for name in pending if name not in descriptions]
+        if not pending:
+            break
+    return descriptions
 
 
 def autocomplete_species(q: str, limit: int = 10) -> list[str]:
-    res = []
-    ql = q.lower()
-    for s in LOCAL_SPECIES:
-        if ql in s.lower():
-            res.append(s)
-        if len(res) >= limit:
-            return res
-    try:
-        gb = search_species_gbif({'limit': limit, 'q': q})
-        for r in gb.get('results', [])[:limit]:
-            name = r.get('scientificName') or r.get('canonicalName')
-            if name and name not in res:
-                res.append(name)
-                if len(res) >= limit:
-                    break
-    except Exception:
-        pass
-    return res
\ No newline at end of file
+    from .catalog import autocomplete
+    return autocomplete(q, limit)
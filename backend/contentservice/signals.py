@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .images import refresh_manifest
+from .models import SpeciesImage
+
+
+@receiver(post_save, sender=SpeciesImage)
+@receiver(post_delete, sender=SpeciesImage)
+def refresh_species_image_manifest(sender, **kwargs):
+    refresh_manifest()
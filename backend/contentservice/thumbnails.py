@@ -0,0 +1,69 @@
+"""
+Caché de derivados de imágenes de especies (miniaturas reescaladas y
+recomprimidas con Pillow), indexada por ruta, mtime y tamaño del original.
+
+Se guardan en ``MEDIA_ROOT/derivatives`` para que las guías PDF y las APIs
+JSON compartan los mismos archivos.
+"""
+import hashlib
+import math
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+
+DERIVATIVE_VERSION = 1
+PRINT_DPI = 150
+JPEG_QUALITY = 80
+THUMBNAIL_SIZE = (320, 240)
+
+
+def derivative_dir():
+    return Path(settings.MEDIA_ROOT) / 'derivatives'
+
+
+def derivative(source, max_width, max_height):
+    """Devuelve la ruta de una copia de ``source`` que cabe en max_width x max_height píxeles."""
+    source = Path(source)
+    try:
+        st = source.stat()
+    except OSError:
+        return None
+    raw = f'{source.resolve()}:{st.st_mtime_ns}:{st.st_size}:{max_width}x{max_height}:{JPEG_QUALITY}:{DERIVATIVE_VERSION}'
+    target = derivative_dir() / f"{hashlib.sha1(raw.encode('utf-8')).hexdigest()}.jpg"
+    if target.exists():
+        return target
+    try:
+        with Image.open(source) as im:
+            im = ImageOps.exif_transpose(im)
+            im.thumbnail((max_width, max_height), Image.LANCZOS)
+            if im.mode in ('RGBA', 'LA', 'P'):
+                im = im.convert('RGBA')
+                background = Image.new('RGB', im.size, (255, 255, 255))
+                background.paste(im, mask=im.getchannel('A'))
+                im = background
+            elif im.mode != 'RGB':
+                im = im.convert('RGB')
+            target.parent.mkdir(parents=True, exist_ok=True)
+            # Escritura atómica: otro worker puede estar generando el mismo derivado
+            fd, tmp = tempfile.mkstemp(dir=target.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as fh:
+                im.save(fh, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, target)
+    except Exception:
+        return None
+    return target
+
+
+def print_derivative(source, width_pt, height_pt, dpi=PRINT_DPI):
+    """Derivado para dibujar en un recuadro de width_pt x height_pt puntos PDF."""
+    return derivative(source, math.ceil(width_pt * dpi / 72), math.ceil(height_pt * dpi / 72))
+
+
+def thumbnail_url(source):
+    target = derivative(source, *THUMBNAIL_SIZE)
+    return f'{settings.MEDIA_URL}derivatives/{target.name}' if target else None
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import generate_ficha, llm_chat, llm_health, autocomplete, export_fichas_csv, teaching_guides
+from .views import generate_ficha, llm_chat, llm_health, autocomplete, export_fichas_csv, teaching_guides, upstream_metrics
 
 urlpatterns = [
     path('generate-ficha', generate_ficha),
@@ -8,4 +8,5 @@ urlpatterns = [
     path('autocomplete', autocomplete),
     path('export', export_fichas_csv),
     path('teaching/guides', teaching_guides),
+    path('metrics', upstream_metrics),
 ]
\ No newline at end of file
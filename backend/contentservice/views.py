@@ -1,24 +1,34 @@
-import os
-import requests
-from pathlib import Path
+import json
+from itertools import chain
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from django.db.models import Q
+from django.utils import timezone
+from django.conf import settings
+from django.utils.http import parse_etags
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from .repository import find_place_id, search_taxa_inat, search_species_gbif, gbif_match, wiki_summary_es, wikidata_description_es, eol_search_title, autocomplete_species
-from .models import SpeciesImage
-from django.conf import settings
-from io import BytesIO
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
+from .repository import find_place_id, search_taxa_inat, search_species_gbif, gbif_match, wiki_summaries_es, wikidata_description_es, wikidata_descriptions_es, eol_search_title, autocomplete_species
+from .images import image_fields, resolve_images
+from .models import SpeciesProfile
+from .profiles import DEFAULT_PLACE, KINGDOM_MAP, MAX_AGE, schedule_stale_refresh, taxon_status_code, wikipedia_title
+from .facets import facet_filter, matches_traits
+from .fanout import fan_out, result, submit
+from naturein import http_client
+from iaservice import conversations, llm, retrieval, router
+from iaservice.admission import client_key, overloaded_response
+from . import cache as upstream_cache
+from . import guides
+from .exports import csv_lines
 
 
 request_schema = openapi.Schema(
     type=openapi.TYPE_OBJECT,
     properties={
         'query': openapi.Schema(type=openapi.TYPE_STRING),
+        'stream': openapi.Schema(type=openapi.TYPE_BOOLEAN, description='Respuesta NDJSON: una línea por ficha y un resumen final'),
         'filters': openapi.Schema(
             type=openapi.TYPE_OBJECT,
             properties={
@@ -44,15 +54,213 @@ response_schema = openapi.Schema(
                     'id': openapi.Schema(type=openapi.TYPE_STRING),
                     'scientificName': openapi.Schema(type=openapi.TYPE_STRING),
                     'imageUrl': openapi.Schema(type=openapi.TYPE_STRING),
+                    'thumbnailUrl': openapi.Schema(type=openapi.TYPE_STRING),
                     'description': openapi.Schema(type=openapi.TYPE_STRING),
                     'kingdom': openapi.Schema(type=openapi.TYPE_STRING),
                     'status': openapi.Schema(type=openapi.TYPE_STRING),
                 },
             ),
         ),
+        'partial': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+        'timings': openapi.Schema(type=openapi.TYPE_OBJECT),
     },
 )
 
+def _local_fichas(place, query, family, cats, estado, alimentacion, reproduccion, desired):
+    qs = SpeciesProfile.objects.filter(place=place, kingdom__in=cats)
+    if query:
+        qs = qs.filter(Q(scientific_name__icontains=query) | Q(common_name__icontains=query))
+    if family:
+        qs = qs.filter(family__iexact=family)
+    if estado:
+        # Igual que en vivo: las especies sin estado conocido no se descartan
+        qs = qs.filter(conservation_status__in=[estado, ''])
+    qs = qs.filter(**facet_filter(alimentacion, reproduccion))
+    profiles = list(qs.order_by('-observations_count')[:desired])
+    if any(p.refreshed_at < timezone.now() - MAX_AGE for p in profiles):
+        schedule_stale_refresh()
+    images = image_fields([p.scientific_name for p in profiles])
+    return [{
+        'id': str(p.inat_id or p.pk),
+        'scientificName': p.scientific_name,
+        **images[p.scientific_name],
+        'description': p.description,
+        'kingdom': p.kingdom,
+        'status': p.conservation_status or None,
+    } for p in profiles]
+
+
+def _gbif_candidates(query, family):
+    params = {'limit': 5, 'rank': 'SPECIES'}
+    if query:
+        params['q'] = query
+    # Filtrar por familia usando higherTaxonKey
+    if family:
+        match = gbif_match(family)
+        fam_key = match.get('usageKey')
+        if fam_key:
+            params['higherTaxonKey'] = fam_key
+    return search_species_gbif(params).get('results', [])[:5]
+
+
+def _with_images(items, names):
+    images = image_fields([name for name in names if name])
+    for item, name in zip(items, names):
+        item.update(images.get(name) or {'imageUrl': None, 'thumbnailUrl': None})
+    return items
+
+
+def _iter_live_fichas(query, family, location, category, cats, estado, alimentacion, reproduccion, desired):
+    """
+    Fichas en vivo por grupos: primero las de iNaturalist y luego las de GBIF,
+    cada grupo en cuanto su enriquecimiento termina.
+    """
+    # Fase 1: búsquedas base de iNaturalist (por reino) y GBIF en paralelo
+    try:
+        place_id = find_place_id(location or DEFAULT_PLACE)
+        inat_cats = cats
+    except Exception:
+        place_id, inat_cats = None, []
+    inat_futures = []
+    for cat in inat_cats:
+        inat_params = {
+            'per_page': desired,
+            'rank': 'species',
+            'is_active': True,
+            'taxon_id': KINGDOM_MAP.get(cat),
+        }
+        if place_id:
+            inat_params['place_id'] = place_id
+        if query:
+            inat_params['q'] = query
+        inat_futures.append(submit(search_taxa_inat, inat_params))
+    gbif_future = submit(_gbif_candidates, query, family)
+
+    # Fase 2: enriquecimiento por lotes; cada fuente sigue sin esperar a la otra
+    candidates = []
+    for cat, future in zip(inat_cats, inat_futures):
+        for t in (result(future) or []):
+            status_code = taxon_status_code(t)
+            if estado and status_code and estado != status_code:
+                continue
+            candidates.append((cat, t, status_code))
+    if not (alimentacion or reproduccion):
+        # Sin filtros de texto no se descarta nada tras enriquecer
+        candidates = candidates[:desired]
+    inat_wiki = submit(wiki_summaries_es, [wikipedia_title(t) for _, t, _ in candidates])
+
+    gbif_rows = []
+    for r in (result(gbif_future) or []):
+        # Filtrar por categoría (reino) si se indicó
+        if category and (r.get('kingdom') or '').lower() != category.lower():
+            continue
+        # Si no se indicó categoría, limitar a flora/fauna en fallback GBIF
+        if not category and (r.get('kingdom') not in ['Plantae', 'Animalia']):
+            continue
+        gbif_rows.append((r, r.get('scientificName') or r.get('canonicalName') or 'Desconocida'))
+    # Sin autoría ("Tapirus terrestris (Linnaeus, 1758)") coincide con los títulos de artículo
+    lookup = {name: r.get('canonicalName') or name for r, name in gbif_rows}
+    gbif_names = list(dict.fromkeys(lookup.values()))
+    gbif_wiki = submit(wiki_summaries_es, gbif_names)
+    gbif_wikidata = submit(wikidata_descriptions_es, gbif_names)
+
+    items, image_names = [], []
+    wiki = result(inat_wiki) or {}
+    for cat, t, status_code in candidates:
+        wp_summary = wiki.get(wikipedia_title(t))
+        name = t.get('name') or 'Desconocida'
+        description = t.get('wikipedia_summary') or ''
+        text = (wp_summary or description or '').lower()
+        if not matches_traits(text, alimentacion, reproduccion):
+            continue
+        if wp_summary:
+            description = wp_summary
+        image_names.append(t.get('name'))
+        items.append({
+            'id': str(t.get('id')),
+            'scientificName': name,
+            'imageUrl': None,
+            'description': description,
+            'kingdom': cat,
+            'status': status_code,
+        })
+        if len(items) >= desired:
+            break
+    if items:
+        yield _with_images(items, image_names)
+
+    # Fase 3: EOL (sin API por lotes) y búsqueda en Wikidata solo para lo que Wikipedia no cubrió
+    wiki, wikidata = result(gbif_wiki) or {}, dict(result(gbif_wikidata) or {})
+    pending = [name for name in gbif_names if not wiki.get(name)]
+    unknown = [name for name in pending if not wikidata.get(name)]
+    fallback = fan_out([(eol_search_title, name) for name in pending] + [(wikidata_description_es, name) for name in unknown])
+    eol = dict(zip(pending, fallback))
+    wikidata.update((name, desc) for name, desc in zip(unknown, fallback[len(pending):]) if desc)
+
+    # GBIF: descripción desde Wikidata/EOL, reemplazada por Wikipedia si existe
+    items, image_names = [], []
+    for r, name in gbif_rows:
+        key = lookup[name]
+        desc, eol_title, wp_summary = wikidata.get(key), eol.get(key), wiki.get(key)
+        description = r.get('kingdom') and f"Reino: {r.get('kingdom')}"
+        if desc:
+            description = desc
+        if eol_title:
+            description = eol_title
+        text = (wp_summary or description or '').lower()
+        if not matches_traits(text, alimentacion, reproduccion):
+            continue
+        if wp_summary:
+            description = wp_summary
+        image_names.append(name)
+        items.append({
+            'id': str(r.get('key')),
+            'scientificName': name,
+            'imageUrl': None,
+            'description': description,
+            'kingdom': r.get('kingdom'),
+            'status': None,
+        })
+    if items:
+        yield _with_images(items, image_names)
+
+
+STUB_FICHA = {
+    'id': 'stub-1',
+    'scientificName': 'Ficus elastica',
+    'description': 'Ejemplo de ficha generada'
+}
+
+
+def _ndjson(record):
+    return json.dumps(record, ensure_ascii=False, default=str) + '\n'
+
+
+def _stream_fichas(local, args):
+    """Una línea JSON por ficha y un resumen final (partial, timings)."""
+    count = 0
+    if local:
+        for item in local:
+            count += 1
+            yield _ndjson({'type': 'item', 'item': item})
+        yield _ndjson({'type': 'summary', 'count': count, 'partial': False})
+        return
+    with http_client.budget(settings.FICHA_DEADLINE_SECONDS) as budget:
+        for group in _iter_live_fichas(*args):
+            for item in group:
+                count += 1
+                yield _ndjson({'type': 'item', 'item': item})
+    if not count:
+        count = 1
+        yield _ndjson({'type': 'item', 'item': dict(STUB_FICHA)})
+    yield _ndjson({
+        'type': 'summary',
+        'count': count,
+        'partial': budget.exhausted or budget.errors > 0,
+        'timings': budget.timings(),
+    })
+
+
 @swagger_auto_schema(method='post', request_body=request_schema, responses={200: response_schema})
 @api_view(['POST'])
 def generate_ficha(request):
@@ -61,178 +269,38 @@ def generate_ficha(request):
     family = (filters.get('family') or '').strip()
     location = (filters.get('location') or '').strip()
     category = (filters.get('category') or '').strip()
-    items = []
     estado = (filters.get('estado') or '').strip().upper()
     alimentacion = (filters.get('alimentacion') or '').strip().lower()
     reproduccion = (filters.get('reproduccion') or '').strip().lower()
-    try:
-        place_query = location or ''
-        if not place_query:
-            for candidate in ['Tingo María', 'Leoncio Prado', 'Huánuco']:
-                place_query = candidate
-                break
-        place_id = find_place_id(place_query)
-
-        desired = 5
-        kingdom_map = {'Plantae': 47126, 'Animalia': 1}
-        cats = [category] if category in kingdom_map else ['Plantae', 'Animalia']
-        for cat in cats:
-            if len(items) >= desired:
-                break
-            kid = kingdom_map.get(cat)
-            inat_params = {
-                'per_page': desired - len(items),
-                'rank': 'species',
-                'is_active': True,
-                'taxon_id': kid,
-            }
-            if place_id:
-                inat_params['place_id'] = place_id
-            if query:
-                inat_params['q'] = query
-            inat = search_taxa_inat(inat_params)
-            for t in inat:
-                name = t.get('name') or 'Desconocida'
-                slug = (t.get('name') or '').lower().replace(' ', '_')
-                image = f"/static/species/{slug}.jpg"
-                rec = SpeciesImage.objects.filter(scientific_name=name).first()
-                if rec:
-                    if getattr(rec, 'image', None):
-                        image = f"/media/{rec.image.name}"
-                    elif rec.filename:
-                        image = f"/static/species/{rec.filename}"
-                description = t.get('wikipedia_summary') or ''
-                status_code = None
-                cs = t.get('conservation_status') or {}
-                if cs:
-                    status_code = (cs.get('status') or '').upper()
-                if not status_code:
-                    for cs2 in (t.get('conservation_statuses') or []):
-                        sc = (cs2.get('status') or '').upper()
-                        if sc:
-                            status_code = sc
-                            break
-                if estado and status_code and estado != status_code:
-                    continue
-                wp = t.get('wikipedia_url') or ''
-                wp_summary = ''
-                if wp:
-                    title = wp.split('/')[-1]
-                    wp_summary = wiki_summary_es(title)
-                text = (wp_summary or description or '').lower()
-                if alimentacion:
-                    if alimentacion.startswith('herb') and ('herbív' not in text and 'herbiv' not in text):
-                        continue
-                    if alimentacion.startswith('carn') and ('carnív' not in text and 'carniv' not in text):
-                        continue
-                    if alimentacion.startswith('omní') or alimentacion.startswith('omni'):
-                        if ('omnív' not in text and 'omniv' not in text):
-                            continue
-                if reproduccion:
-                    if reproduccion.startswith('sexu') and ('sexual' not in text and 'sexuada' not in text):
-                        continue
-                    if reproduccion.startswith('asex') and ('asexual' not in text and 'apomix' not in text and 'bipartición' not in text and 'espor' not in text):
-                        continue
-                if wp_summary:
-                    description = wp_summary
-                items.append({
-                    'id': str(t.get('id')),
-                    'scientificName': name,
-                    'imageUrl': image,
-                    'description': description,
-                    'kingdom': cat,
-                    'status': status_code,
-                })
-                if len(items) >= desired:
-                    break
-    except Exception:
-        pass
+    desired = 5
+    cats = [category] if category in KINGDOM_MAP else ['Plantae', 'Animalia']
+
+    # Fichas materializadas: una sola consulta indexada, sin depender de servicios externos
+    local = _local_fichas(location or DEFAULT_PLACE, query, family, cats, estado, alimentacion, reproduccion, desired)
+    args = (query, family, location, category, cats, estado, alimentacion, reproduccion, desired)
+    # Opcional ("stream": true): NDJSON con cada ficha en cuanto está lista
+    if llm.wants_stream(request):
+        response = StreamingHttpResponse(_stream_fichas(local, args), content_type='application/x-ndjson')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    if local:
+        return Response({'items': local, 'partial': False})
+
+    # Presupuesto total para los servicios externos: se devuelve lo que esté listo
+    with http_client.budget(settings.FICHA_DEADLINE_SECONDS) as budget:
+        items = list(chain.from_iterable(_iter_live_fichas(*args)))
+    return Response({
+        'items': items or [dict(STUB_FICHA)],
+        'partial': budget.exhausted or budget.errors > 0,
+        'timings': budget.timings(),
+    })
 
-    # Try GBIF species search, add iNaturalist image, fallback to stub
-    try:
-        params = {'limit': 5, 'rank': 'SPECIES'}
-        if query:
-            params['q'] = query
-        # Filtrar por familia usando higherTaxonKey
-        if family:
-            match = gbif_match(family)
-            fam_key = match.get('usageKey')
-            if fam_key:
-                params['higherTaxonKey'] = fam_key
-        gbif = search_species_gbif(params)
-        for r in gbif.get('results', [])[:5]:
-            name = r.get('scientificName') or r.get('canonicalName') or 'Desconocida'
-            image = None
-            # Filtrar por categoría (reino) si se indicó
-            if category and (r.get('kingdom') or '').lower() != category.lower():
-                continue
-            try:
-                inat_params = {'q': name, 'per_page': 1}
-                if location:
-                    place_id2 = find_place_id(location)
-                    if place_id2:
-                        inat_params['place_id'] = place_id2
-                inat = search_taxa_inat(inat_params)
-                taxon = (inat or [{}])[0]
-                slug2 = (name or '').lower().replace(' ', '_')
-                image = f"/static/species/{slug2}.jpg"
-                rec2 = SpeciesImage.objects.filter(scientific_name=name).first()
-                if rec2:
-                    if getattr(rec2, 'image', None):
-                        image = f"/media/{rec2.image.name}"
-                    elif rec2.filename:
-                        image = f"/static/species/{rec2.filename}"
-            except Exception:
-                image = None
-
-            # Enriquecer descripción con Wikidata/EOL
-            description = r.get('kingdom') and f"Reino: {r.get('kingdom')}"
-            desc = wikidata_description_es(name)
-            if desc:
-                description = desc
-            eol_title = eol_search_title(name)
-            if eol_title:
-                description = eol_title or description
-            wp_summary = ''
-            wp_summary = wiki_summary_es(name)
-            text = (wp_summary or description or '').lower()
-            if alimentacion:
-                if alimentacion.startswith('herb') and ('herbív' not in text and 'herbiv' not in text):
-                    continue
-                if alimentacion.startswith('carn') and ('carnív' not in text and 'carniv' not in text):
-                    continue
-                if alimentacion.startswith('omní') or alimentacion.startswith('omni'):
-                    if ('omnív' not in text and 'omniv' not in text):
-                        continue
-            if reproduccion:
-                if reproduccion.startswith('sexu') and ('sexual' not in text and 'sexuada' not in text):
-                    continue
-                if reproduccion.startswith('asex') and ('asexual' not in text and 'apomix' not in text and 'bipartición' not in text and 'espor' not in text):
-                    continue
-            if wp_summary:
-                description = wp_summary
-
-            # Si no se indicó categoría, limitar a flora/fauna en fallback GBIF
-            if not category and (r.get('kingdom') not in ['Plantae', 'Animalia']):
-                continue
-            items.append({
-                'id': str(r.get('key')),
-                'scientificName': name,
-                'imageUrl': image,
-                'description': description,
-                'kingdom': r.get('kingdom'),
-                'status': None,
-            })
-    except Exception:
-        pass
 
-    if not items:
-        items = [{
-            'id': 'stub-1',
-            'scientificName': 'Ficus elastica',
-            'description': 'Ejemplo de ficha generada'
-        }]
-    return Response({'items': items})
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def upstream_metrics(request):
+    return Response({'cache': upstream_cache.stats(), 'http': http_client.stats(), 'llm': llm.stats(), 'backends': router.stats()})
 
 
 @api_view(['GET'])
@@ -252,19 +320,14 @@ def export_fichas_csv(request):
     role = getattr(getattr(request.user, 'role', None), 'role', 'student')
     if role not in ['teacher', 'expert']:
         return Response({'detail': 'no autorizado'}, status=403)
-    query = request.GET.get('q') or ''
-    gb = search_species_gbif({'limit': 50, 'q': query})
-    rows = []
-    for r in gb.get('results', [])[:50]:
-        rows.append(
-            [
-                str(r.get('key') or ''),
-                r.get('scientificName') or r.get('canonicalName') or '',
-                r.get('kingdom') or ''
-            ]
-        )
-    content = 'id,nombre,rein\n' + '\n'.join([','.join(row) for row in rows])
-    return Response(content, headers={'Content-Type': 'text/csv'})
+    query = (request.GET.get('q') or '').strip()
+    try:
+        limit = max(int(request.GET.get('limit') or 0), 0)
+    except ValueError:
+        return Response({'error': 'limit inválido'}, status=400)
+    response = StreamingHttpResponse(csv_lines(query, limit), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="fichas.csv"'
+    return response
 
 
 guide_request = openapi.Schema(
@@ -283,121 +346,91 @@ def teaching_guides(request):
     role = getattr(getattr(request.user, 'role', None), 'role', 'student')
     if role not in ['teacher', 'expert']:
         return Response({'detail': 'no autorizado'}, status=403)
-    species = request.data.get('species') or []
-    if not species:
-        species = ['Tapirus terrestris', 'Pecari tajacu', 'Rupicola peruvianus', 'Cedrela odorata', 'Ficus elastica']
-    title = (request.data.get('title') or 'Guía pedagógica NatureIn').strip()
-
-    buf = BytesIO()
-    c = canvas.Canvas(buf, pagesize=A4)
-    width, height = A4
-    c.setTitle(title)
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(40, height - 60, title)
-    c.setFont("Helvetica", 10)
-    c.drawString(40, height - 80, "Selección de especies para actividades y trivia")
-    y = height - 110
-
-    for name in species:
-        if y < 120:
-            c.showPage()
-            y = height - 60
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(40, y, name)
-        y -= 16
-        # Descripción (Wikidata/EOL/Wikipedia)
-        desc = wikidata_description_es(name) or eol_search_title(name) or wiki_summary_es(name)
-        c.setFont("Helvetica", 10)
-        for line in (desc or "Sin descripción disponible").split('\n'):
-            c.drawString(40, y, (line[:110] + ('…' if len(line) > 110 else '')))
-            y -= 14
-            if y < 120:
-                c.showPage(); y = height - 60
-        # Imagen estática si existe
-        rec = SpeciesImage.objects.filter(scientific_name=name).first()
-        img_path = None
-        if rec and getattr(rec, 'image', None):
-            img_path = Path(settings.MEDIA_ROOT) / rec.image.name
-        else:
-            filename = (rec.filename if rec and rec.filename else (name.lower().replace(' ', '_') + '.jpg'))
-            img_path = settings.BASE_DIR / 'static' / 'species' / filename
-        if img_path and img_path.exists():
-            try:
-                img = ImageReader(str(img_path))
-                c.drawImage(img, 40, y - 140, width=200, height=140, preserveAspectRatio=True, mask='auto')
-                y -= 160
-            except Exception:
-                pass
-        # Separador
-        c.line(40, y, width - 40, y)
-        y -= 20
-
-    c.showPage()
-    c.save()
-    pdf = buf.getvalue()
-    buf.close()
+    species = [s for s in (request.data.get('species') or []) if s] or guides.DEFAULT_SPECIES
+    title = (request.data.get('title') or guides.DEFAULT_TITLE).strip()
+
+    images = resolve_images(species)
+    key = guides.guide_key(species, title, images)
+    etag = f'"{key}"'
     headers = {
-        'Content-Type': 'application/pdf',
-        'Content-Disposition': 'attachment; filename="guia_pedagogica.pdf"'
+        'ETag': etag,
+        'Cache-Control': 'private, no-cache',
+        'Content-Disposition': 'attachment; filename="guia_pedagogica.pdf"',
     }
-    return Response(pdf, headers=headers)
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    pdf = guides.load(key)
+    if pdf is None:
+        pdf, complete = guides.render_guide(species, title, images)
+        # Una guía con descripciones caídas no se guarda ni se valida con ETag: la próxima petición reintenta
+        if complete:
+            guides.store(key, pdf)
+        else:
+            del headers['ETag']
+            headers['Cache-Control'] = 'no-store'
+    return HttpResponse(pdf, content_type='application/pdf', headers=headers)
+
+
+LLM_UNAVAILABLE = 'No pude conectarme con la IA. Verifica GROQ_API_KEY o que Ollama (llama3) esté ejecutándose.'
 
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def llm_chat(request):
     message = (request.data.get('message') or '').strip()
-    history = request.data.get('history') or []
     if not message:
         return Response({'error': 'message requerido'}, status=400)
+    conversation_id = request.data.get('conversationId') or request.data.get('conversation_id')
+    if conversation_id:
+        conv = conversations.get_conversation(conversation_id, request.user)
+        if conv is None:
+            return Response({'error': 'conversación no encontrada'}, status=404)
+    else:
+        # Clientes antiguos envían todo el historial: se guarda una vez y desde ahí se usa el id
+        conv = conversations.start_conversation(request.user, request.data.get('history') or [])
     system_prompt = 'Eres un asistente virtual llamado Ángela que responde preguntas con respuestas simples y amigables.'
-    msgs = [{'role': 'system', 'content': system_prompt}]
-    for h in history:
-        role = h.get('role')
-        text = h.get('text') or h.get('content') or ''
-        if role in ['user', 'assistant'] and text:
-            msgs.append({'role': role, 'content': text})
-    msgs.append({'role': 'user', 'content': message})
-
-    groq_key = os.environ.get('GROQ_API_KEY')
-    if groq_key:
-        try:
-            model = os.environ.get('GROQ_MODEL', 'llama-3.1-8b-instant')
-            r = requests.post(
-                'https://api.groq.com/openai/v1/chat/completions',
-                headers={'Authorization': f'Bearer {groq_key}', 'Content-Type': 'application/json'},
-                json={'model': model, 'messages': msgs},
-                timeout=60
-            )
-            j = r.json()
-            reply = (((j.get('choices') or [{}])[0].get('message') or {}).get('content')) or ''
-            return Response({'reply': reply})
-        except Exception:
-            pass
 
+    def remember(reply):
+        conversations.append_exchange(conv, message, reply)
+
+    passages, faq = retrieval.lookup(message)
+    if faq:
+        remember(faq)
+        if llm.wants_stream(request):
+            return llm.sse_response(chain([llm.sse_event('conversation', {'conversationId': str(conv.pk)})], llm.sse_cached(faq, 'faq')))
+        return Response({'reply': faq, 'conversationId': str(conv.pk), 'source': 'faq'})
+    msgs = conversations.build_messages(conv, retrieval.with_context(system_prompt, passages), message)
+
+    options = {'num_predict': 128}
+    client = client_key(request)
+    if llm.wants_stream(request):
+        try:
+            events = router.stream_events(msgs, options, client, fallback=LLM_UNAVAILABLE, on_done=remember)
+        except router.Overloaded as exc:
+            return overloaded_response(exc)
+        return llm.sse_response(chain([llm.sse_event('conversation', {'conversationId': str(conv.pk)})], events))
     try:
-        base = os.environ.get('LLM_BASE_URL', 'http://localhost:11434')
-        model = os.environ.get('LLM_MODEL', 'llama3:latest')
-        r = requests.post(
-            f"{base}/api/chat",
-            json={'model': model, 'messages': msgs, 'stream': False, 'options': {'num_predict': 128}},
-            timeout=60
-        )
-        data = r.json()
-        content = ((data.get('message') or {}).get('content')) or ''
-        return Response({'reply': content})
-    except Exception:
-        return Response({'reply': 'No pude conectarme con la IA. Verifica GROQ_API_KEY o que Ollama (llama3) esté ejecutándose.'})
+        result = router.complete(msgs, options, client)
+    except router.Overloaded as exc:
+        return overloaded_response(exc)
+    except router.RouterError:
+        return Response({'reply': LLM_UNAVAILABLE, 'conversationId': str(conv.pk)})
+    remember(result.text)
+    return Response({'reply': result.text, 'conversationId': str(conv.pk), 'backend': result.backend})
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def llm_health(request):
-    base = os.environ.get('LLM_BASE_URL', 'http://localhost:11434')
-    model = os.environ.get('LLM_MODEL', 'llama3:latest')
-    try:
-        tags = requests.get(f"{base}/api/tags", timeout=5).json()
-        models = [t.get('name') for t in (tags.get('models') or [])]
-        return Response({'available': True, 'models': models, 'modelConfigured': model})
-    except Exception:
-        return Response({'available': False, 'models': [], 'modelConfigured': model})
\ No newline at end of file
+    snapshot = router.health()
+    ollama = snapshot['backends'].get('ollama') or {}
+    stats = router.stats()
+    return Response({
+        'available': any(b['available'] for b in snapshot['backends'].values()),
+        'models': ollama.get('models') or [],
+        'modelConfigured': llm.ollama_model(),
+        'checkedAt': snapshot['checked_at'],
+        'backends': {name: {**info, **stats.get(name, {})} for name, info in snapshot['backends'].items()},
+    })
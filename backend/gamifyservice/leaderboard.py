@@ -0,0 +1,165 @@
+"""
+Tabla de clasificación.
+
+Las páginas se leen de la base con paginación por cursor sobre el índice
+(-points, user): cada página cuesta lo mismo sin importar su profundidad. La
+posición de un puntaje (cuántos usuarios tienen más puntos, más uno) sale de
+un índice en memoria ordenado por (-points, user_id) con ``bisect``; el camino
+de premios lo actualiza tras cada commit y cada ``GAMIFY_LEADERBOARD_TTL``
+segundos se reconstruye desde la base en un hilo aparte, para recoger lo que
+cambiaron otros workers. Mientras no hay índice se usa un COUNT indexado.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import UserScore
+
+
+TTL = float(os.environ.get('GAMIFY_LEADERBOARD_TTL', '30'))
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class PositionIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []
+        self._points = {}
+        self._built_at = None
+        # Cambios recibidos mientras se reconstruye; se reaplican sobre la lista nueva
+        self._pending = None
+        self._generation = 0
+
+    def _ready(self):
+        """
+        True si hay índice utilizable. Si falta o venció se reconstruye en un
+        hilo aparte y se reemplaza de una vez; mientras tanto se sigue usando
+        el anterior (o, sin ninguno, el COUNT indexado).
+        """
+        if self._pending is None and (self._built_at is None or time.monotonic() - self._built_at >= TTL):
+            self._pending = []
+            threading.Thread(target=self._rebuild, args=(self._generation,), name='leaderboard-rebuild', daemon=True).start()
+        return self._built_at is not None
+
+    def _rebuild(self, generation):
+        try:
+            rows = list(UserScore.objects.order_by('-points', 'user_id').values_list('user_id', 'points'))
+        except Exception:
+            rows = None
+        finally:
+            connection.close()
+        with self._lock:
+            pending, self._pending = self._pending, None
+            if rows is None or generation != self._generation:
+                # Falló o se invalidó durante la lectura: la próxima consulta vuelve a intentarlo
+                return
+            self._keys = [(-points, uid) for uid, points in rows]
+            self._points = dict(rows)
+            self._built_at = time.monotonic()
+            self._apply(pending)
+
+    def _apply(self, moves):
+        for user_id, points in moves:
+            old = self._points.get(user_id)
+            if old is not None:
+                i = bisect_left(self._keys, (-old, user_id))
+                if i < len(self._keys) and self._keys[i] == (-old, user_id):
+                    del self._keys[i]
+            insort(self._keys, (-points, user_id))
+            self._points[user_id] = points
+
+    def position(self, points):
+        """1 + cantidad de usuarios con más puntos que ``points``."""
+        with self._lock:
+            if self._ready():
+                return bisect_left(self._keys, (-points, -1)) + 1
+        return UserScore.objects.filter(points__gt=points).count() + 1
+
+    def size(self):
+        with self._lock:
+            if self._ready():
+                return len(self._keys)
+        return UserScore.objects.count()
+
+    def update(self, moves):
+        """Mueve cada (user_id, puntos) a su nuevo lugar (búsqueda O(log n) + inserción)."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(moves)
+            if self._built_at is not None:
+                self._apply(moves)
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+            self._generation += 1
+
+
+positions = PositionIndex()
+
+
+def encode_cursor(points, user_id):
+    return f'{points}:{user_id}'
+
+
+def decode_cursor(cursor):
+    try:
+        points, user_id = cursor.split(':')
+        return int(points), int(user_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _row(score, position):
+    return {
+        'user_id': score.user_id,
+        'puntos': score.points,
+        'rango': score.rank.name if score.rank else None,
+        'posicion': position,
+    }
+
+
+def _ordered():
+    return UserScore.objects.select_related('rank').order_by('-points', 'user_id')
+
+
+def _with_positions(scores):
+    # Empates: todos comparten la posición del primero con ese puntaje
+    by_points = {}
+    for s in scores:
+        if s.points not in by_points:
+            by_points[s.points] = positions.position(s.points)
+    return [_row(s, by_points[s.points]) for s in scores]
+
+
+def page(cursor=None, limit=PAGE_SIZE):
+    """Una página ordenada por puntos; devuelve (filas, cursor siguiente o None)."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    qs = _ordered()
+    after = decode_cursor(cursor) if cursor else None
+    if after:
+        points, user_id = after
+        qs = qs.filter(Q(points__lt=points) | Q(points=points, user_id__gt=user_id))
+    scores = list(qs[:limit + 1])
+    more = len(scores) > limit
+    scores = scores[:limit]
+    next_cursor = encode_cursor(scores[-1].points, scores[-1].user_id) if more else None
+    return _with_positions(scores), next_cursor
+
+
+def around(score, radius=5):
+    """Ventana de ``radius`` usuarios por encima y por debajo de ``score``."""
+    above = list(
+        UserScore.objects.select_related('rank')
+        .filter(Q(points__gt=score.points) | Q(points=score.points, user_id__lt=score.user_id))
+        .order_by('points', '-user_id')[:radius]
+    )
+    below = list(
+        _ordered().filter(Q(points__lt=score.points) | Q(points=score.points, user_id__gt=score.user_id))[:radius]
+    )
+    return _with_positions(list(reversed(above)) + [score] + below)
@@ -0,0 +1,128 @@
+"""
+Compactación del libro de puntos (``Point``).
+
+Los ``Point`` de meses ya cerrados y más antiguos que la ventana de retención
+se suman por usuario y mes en ``PointSnapshot`` y se borran en la misma
+transacción. El total del libro es la suma de los snapshots más la cola
+reciente de ``Point``, calculada en una sola sentencia SQL: su costo ya no
+crece con el historial.
+"""
+import os
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import leaderboard, thresholds
+from .models import Point, PointSnapshot, UserScore
+
+
+KEEP_DAYS = int(os.environ.get('GAMIFY_LEDGER_KEEP_DAYS', '90'))
+
+
+def _sum_for(model, field):
+    return Coalesce(
+        Subquery(model.objects.filter(user=OuterRef('pk')).values('user').annotate(s=Sum(field)).values('s')),
+        Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def with_ledger_total(users):
+    """Anota ``ledger_total`` (snapshots + cola de Point) sobre un queryset de usuarios."""
+    return users.annotate(ledger_total=_sum_for(PointSnapshot, 'total') + _sum_for(Point, 'value'))
+
+
+def ledger_total(user):
+    # Una sola sentencia: una compactación concurrente no puede contarse dos veces ni perderse
+    total = with_ledger_total(get_user_model().objects.filter(pk=user.pk)).values_list('ledger_total', flat=True).first()
+    return total or 0
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _aware(day):
+    moment = datetime.combine(day, time.min)
+    return timezone.make_aware(moment) if settings.USE_TZ else moment
+
+
+def cutoff(keep_days=KEEP_DAYS):
+    """Inicio del mes que contiene el límite de retención: solo se compactan meses completos."""
+    return _month_start(timezone.localdate() - timedelta(days=keep_days))
+
+
+def compact_month(month):
+    """Compacta los Point de ``month`` (primer día del mes); devuelve (filas borradas, snapshots)."""
+    start, end = _aware(month), _aware(_next_month(month))
+    with transaction.atomic():
+        rows = Point.objects.filter(created_at__gte=start, created_at__lt=end)
+        sums = {uid: (total, count) for uid, total, count in rows.values('user_id').annotate(t=Sum('value'), n=Count('pk')).values_list('user_id', 't', 'n')}
+        if not sums:
+            return 0, 0
+        existing = {
+            s.user_id: s
+            for s in PointSnapshot.objects.select_for_update().filter(period=month, user_id__in=list(sums))
+        }
+        snapshots = []
+        for uid, (total, count) in sums.items():
+            old = existing.get(uid)
+            snapshots.append(PointSnapshot(
+                user_id=uid,
+                period=month,
+                total=total + (old.total if old else 0),
+                points_count=count + (old.points_count if old else 0),
+            ))
+        PointSnapshot.objects.bulk_create(
+            snapshots,
+            update_conflicts=True,
+            unique_fields=['user', 'period'],
+            update_fields=['total', 'points_count', 'compacted_at'],
+        )
+        deleted, _ = rows.delete()
+    return deleted, len(snapshots)
+
+
+def compact(keep_days=KEEP_DAYS, log=None):
+    """Compacta mes a mes todo lo anterior a ``cutoff``; cada mes en su propia transacción."""
+    limit = cutoff(keep_days)
+    oldest = Point.objects.filter(created_at__lt=_aware(limit)).order_by('created_at').values_list('created_at', flat=True).first()
+    if oldest is None:
+        return 0
+    month = _month_start(timezone.localtime(oldest).date() if settings.USE_TZ else oldest.date())
+    total = 0
+    while month < limit:
+        deleted, snapshots = compact_month(month)
+        total += deleted
+        if log and deleted:
+            log(f'{month:%Y-%m}: {deleted} puntos en {snapshots} snapshots')
+        month = _next_month(month)
+    return total
+
+
+def mismatches():
+    """Usuarios cuyo UserScore.points no coincide con el libro: (user_id, score, libro)."""
+    users = with_ledger_total(get_user_model().objects.filter(userscore__isnull=False)).annotate(score=F('userscore__points'))
+    return list(users.exclude(score=F('ledger_total')).values_list('pk', 'score', 'ledger_total'))
+
+
+def reconcile(fix=False):
+    """Lista las diferencias con UserScore y, con ``fix``, ajusta UserScore al libro."""
+    found = mismatches()
+    if fix and found:
+        tables = thresholds.get()
+        with transaction.atomic():
+            for uid, _, total in found:
+                rank = tables.rank_for(total)
+                UserScore.objects.filter(user_id=uid).update(points=total, **({'rank_id': rank[0]} if rank else {}))
+            transaction.on_commit(leaderboard.positions.invalidate)
+    return found
@@ -0,0 +1,32 @@
+"""
+Compacta el libro de puntos: los ``Point`` de meses cerrados más antiguos que
+la retención pasan a ``PointSnapshot`` (uno por usuario y mes). Pensado para
+cron; con --reconcile compara además el libro con ``UserScore``.
+"""
+from django.core.management.base import BaseCommand
+
+from gamifyservice.ledger import KEEP_DAYS, compact, cutoff, reconcile
+
+
+class Command(BaseCommand):
+    help = 'Compacta los Point antiguos en snapshots mensuales y concilia con UserScore'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=KEEP_DAYS, help='Días de Point que se conservan sin compactar')
+        parser.add_argument('--reconcile', action='store_true', help='Comparar el libro con UserScore.points')
+        parser.add_argument('--fix', action='store_true', help='Con --reconcile, ajustar UserScore al libro')
+
+    def handle(self, *args, **options):
+        total = compact(options['keep_days'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f"Compactados {total} puntos anteriores a {cutoff(options['keep_days'])}"))
+        if not options['reconcile']:
+            return
+        found = reconcile(fix=options['fix'])
+        for uid, score, total in found[:50]:
+            self.stdout.write(f'usuario {uid}: UserScore {score}, libro {total}')
+        if not found:
+            self.stdout.write(self.style.SUCCESS('UserScore coincide con el libro'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'{len(found)} UserScore ajustados al libro'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(found)} usuarios no coinciden (usar --fix para ajustar)'))
@@ -0,0 +1,71 @@
+"""
+Prueba de carga de la acumulación de puntos: varios hilos premian a la vez a
+los mismos usuarios (como una clase que termina una misión junta) y al final
+se comprueba que no se perdió ningún punto. Crea usuarios temporales y los
+borra al terminar. Ejecutar contra PostgreSQL: SQLite serializa las escrituras.
+"""
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.db.models import Sum
+
+from gamifyservice.models import Point, UserScore
+from gamifyservice.scoring import add_points
+
+
+class Command(BaseCommand):
+    help = 'Premia en paralelo a usuarios temporales y verifica que no se pierdan puntos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--awards', type=int, default=50, help='Premios por hilo')
+        parser.add_argument('--points', type=int, default=10)
+        parser.add_argument('--keep', action='store_true', help='No borrar los usuarios temporales')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        prefix = f'stress-{uuid.uuid4().hex[:8]}'
+        users = [User.objects.create(username=f'{prefix}-{i}', email=f'{prefix}-{i}@example.invalid') for i in range(options['users'])]
+        errors = []
+        barrier = threading.Barrier(options['threads'])
+
+        def worker(index):
+            try:
+                barrier.wait()
+                for n in range(options['awards']):
+                    # Todos los hilos recorren los mismos usuarios: máxima contención por fila
+                    add_points(users[(index + n) % len(users)], options['points'])
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                close_old_connections()
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        start = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - start
+
+        try:
+            total = options['threads'] * options['awards']
+            expected = total * options['points']
+            scored = UserScore.objects.filter(user__in=users).aggregate(s=Sum('points'))['s'] or 0
+            logged = Point.objects.filter(user__in=users).aggregate(s=Sum('value'))['s'] or 0
+            self.stdout.write(f'{total} premios en {elapsed:.2f} s ({total / elapsed:.0f} premios/s), {len(errors)} errores')
+            self.stdout.write(f'Esperado {expected}, UserScore {scored}, Point {logged}')
+        finally:
+            if not options['keep']:
+                User.objects.filter(pk__in=[u.pk for u in users]).delete()
+        if errors:
+            raise CommandError(f'{len(errors)} premios fallaron; primero: {errors[0]!r}')
+        if scored != logged or logged != expected:
+            raise CommandError('Se perdieron puntos en la acumulación concurrente')
+        self.stdout.write(self.style.SUCCESS('Sin pérdidas de puntos'))
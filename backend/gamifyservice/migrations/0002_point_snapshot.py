@@ -0,0 +1,39 @@
+# Generated by Django 5.1.3 on 2026-10-18 15:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamifyservice', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('total', models.IntegerField(default=0)),
+                ('points_count', models.IntegerField(default=0)),
+                ('compacted_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='point',
+            index=models.Index(fields=['user', 'created_at'], name='gamifyservi_user_id_9212ed_idx'),
+        ),
+        migrations.AddField(
+            model_name='pointsnapshot',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='pointsnapshot',
+            unique_together={('user', 'period')},
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.3 on 2026-10-18 15:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamifyservice', '0002_point_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userscore',
+            index=models.Index(fields=['-points', 'user'], name='userscore_points_user_idx'),
+        ),
+    ]
@@ -8,6 +8,21 @@ class Point(models.Model):
     value = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['user', 'created_at'])]
+
+
+class PointSnapshot(models.Model):
+    """Puntos compactados de un usuario en un mes (los ``Point`` originales se borran)."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    period = models.DateField()
+    total = models.IntegerField(default=0)
+    points_count = models.IntegerField(default=0)
+    compacted_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'period')
+
 
 class Badge(models.Model):
     name = models.CharField(max_length=64, unique=True)
@@ -41,6 +56,8 @@ class UserScore(models.Model):
 
     class Meta:
         unique_together = ('user',)
+        # Orden de la clasificación y paginación por cursor
+        indexes = [models.Index(fields=['-points', 'user'], name='userscore_points_user_idx')]
 
 
 class BadgeDefinition(models.Model):
@@ -0,0 +1,171 @@
+"""
+Acumulación de puntos y rango de los usuarios.
+
+Cada premio se suma con un UPDATE condicional (``points = points + n``) dentro
+de la transacción que guarda el ``Point``. No hay lectura-modificación-escritura
+en Python, así que premios simultáneos al mismo usuario no pierden puntos. El
+rango y las badges por umbral salen de las tablas en memoria de
+``thresholds``: solo se escribe el rango si cambió y solo se insertan las
+badges cuyo umbral cruzó el premio. ``award_many`` hace lo mismo para un lote
+(un evento de toda la clase) con un número fijo de sentencias.
+"""
+from typing import NamedTuple, Optional
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from . import leaderboard, thresholds
+from .models import Badge, Point, UserBadge, UserScore
+
+
+class Accrual(NamedTuple):
+    total: Optional[int]
+    rank: Optional[str]
+    previous: Optional[int]
+
+
+def _rank(tables, total, current_id):
+    """(id, nombre) del rango para ``total``; si ninguno aplica se conserva el actual."""
+    rank = tables.rank_for(total)
+    if rank is None and current_id is not None:
+        return current_id, dict(tables.ranks).get(current_id)
+    return rank or (None, None)
+
+
+def add_points(user, points):
+    """Suma ``points`` al usuario; devuelve el total, el rango y el total anterior."""
+    if not points:
+        return Accrual(None, None, None)
+    tables = thresholds.get()
+    with transaction.atomic():
+        Point.objects.create(user=user, value=points)
+        updated = UserScore.objects.filter(user=user).update(points=F('points') + points)
+        if not updated:
+            try:
+                # Primer premio del usuario; si otro lo crea a la vez, se suma sobre el suyo
+                with transaction.atomic():
+                    UserScore.objects.create(user=user, points=points)
+            except IntegrityError:
+                UserScore.objects.filter(user=user).update(points=F('points') + points)
+        # La fila queda bloqueada por el UPDATE hasta el commit: la lectura es la propia
+        total, rank_id = UserScore.objects.filter(user=user).values_list('points', 'rank_id').get()
+        new_id, name = _rank(tables, total, rank_id)
+        if new_id != rank_id:
+            UserScore.objects.filter(user=user).update(rank_id=new_id)
+        transaction.on_commit(lambda: leaderboard.positions.update([(user.pk, total)]))
+    return Accrual(total, name, total - points)
+
+
+def _badges_by_name(defaults):
+    """Badges por nombre, creando en bloque las que falten; ``defaults`` es {nombre: descripción}."""
+    Badge.objects.bulk_create([Badge(name=name, description=desc) for name, desc in defaults.items()], ignore_conflicts=True)
+    return {b.name: b for b in Badge.objects.filter(name__in=list(defaults))}
+
+
+def _grant(wanted, defaults):
+    """Inserta las parejas (user_id, nombre de badge) que falten."""
+    if not wanted:
+        return
+    badges = _badges_by_name(defaults)
+    UserBadge.objects.bulk_create(
+        [UserBadge(user_id=uid, badge=badges[name]) for uid, name in dict.fromkeys(wanted)],
+        ignore_conflicts=True,
+    )
+
+
+def _badge_for_code(tables, code):
+    defn = tables.by_code.get(code)
+    return (defn.name, defn.description) if defn else (code, '')
+
+
+def grant_badge(user, code):
+    """Otorga la badge de ``code`` (o una con ese nombre si no hay definición); devuelve su nombre."""
+    name, description = _badge_for_code(thresholds.get(), code)
+    _grant([(user.pk, name)], {name: description})
+    return name
+
+
+def grant_crossed_badges(user, accrual):
+    """Badges cuyo umbral cruzó el premio; las alcanzadas antes no se tocan."""
+    if accrual.total is None:
+        return []
+    crossed = thresholds.get().crossed(accrual.previous, accrual.total)
+    _grant([(user.pk, d.name) for d in crossed], {d.name: d.description for d in crossed})
+    return [d.name for d in crossed]
+
+
+def _parse_entry(entry):
+    try:
+        return int(entry.get('user_id')), int(entry.get('puntos') or 0), entry.get('badge_code') or None
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def award_many(entries):
+    """
+    Premia un lote de entradas {user_id, puntos, badge_code} en una sola
+    transacción. Devuelve un resultado por entrada, en el mismo orden; el
+    total y el rango son los del usuario al terminar todo el lote.
+    """
+    parsed = [_parse_entry(e) for e in entries]
+    users = get_user_model().objects.in_bulk({p[0] for p in parsed if p})
+    results = [None] * len(parsed)
+    valid = []
+    for i, p in enumerate(parsed):
+        if p is None:
+            results[i] = {'error': 'entrada inválida'}
+        elif p[0] not in users:
+            results[i] = {'user_id': p[0], 'error': 'usuario no encontrado'}
+        else:
+            valid.append((i, *p))
+    if not valid:
+        return results
+
+    deltas = {}
+    for _, uid, puntos, _ in valid:
+        if puntos:
+            deltas[uid] = deltas.get(uid, 0) + puntos
+    tables = thresholds.get()
+    with transaction.atomic():
+        Point.objects.bulk_create([Point(user_id=uid, value=puntos) for _, uid, puntos, _ in valid if puntos])
+        if deltas:
+            UserScore.objects.bulk_create([UserScore(user_id=uid) for uid in deltas], ignore_conflicts=True)
+            UserScore.objects.filter(user_id__in=list(deltas)).update(points=F('points') + Case(
+                *[When(user_id=uid, then=Value(delta)) for uid, delta in deltas.items()],
+                default=Value(0), output_field=IntegerField(),
+            ))
+        totals, moved = {}, {}
+        for uid, points, rank_id in UserScore.objects.filter(user_id__in=[v[1] for v in valid]).values_list('user_id', 'points', 'rank_id'):
+            new_id, name = _rank(tables, points, rank_id)
+            totals[uid] = (points, name)
+            if new_id != rank_id:
+                moved[uid] = new_id
+        if moved:
+            # Solo se reescriben los usuarios que cambiaron de rango
+            UserScore.objects.filter(user_id__in=list(moved)).update(rank_id=Case(
+                *[When(user_id=uid, then=Value(rank_id)) for uid, rank_id in moved.items()],
+                output_field=IntegerField(),
+            ))
+
+        # Badges pedidas explícitamente y, si no se pidió ninguna, las de umbral cruzado en el lote
+        wanted, defaults = [], {}
+        for _, uid, _, code in valid:
+            if code:
+                name, description = _badge_for_code(tables, code)
+                defaults.setdefault(name, description)
+                wanted.append((uid, name))
+            elif uid in totals:
+                total = totals[uid][0]
+                for defn in tables.crossed(total - deltas.get(uid, 0), total):
+                    defaults.setdefault(defn.name, defn.description)
+                    wanted.append((uid, defn.name))
+        _grant(wanted, defaults)
+        moves = [(uid, totals[uid][0]) for uid in deltas if uid in totals]
+        transaction.on_commit(lambda: leaderboard.positions.update(moves))
+
+    for i, uid, puntos, code in valid:
+        total, rank = totals.get(uid, (None, None))
+        awarded = _badge_for_code(tables, code)[0] if code else None
+        results[i] = {'user_id': uid, 'awarded_points': puntos, 'new_total': total, 'rank': rank, 'awarded_badge': awarded}
+    return results
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import thresholds
+from .models import BadgeDefinition, Rank
+
+
+@receiver(post_save, sender=Rank)
+@receiver(post_delete, sender=Rank)
+@receiver(post_save, sender=BadgeDefinition)
+@receiver(post_delete, sender=BadgeDefinition)
+def invalidate_thresholds(sender, **kwargs):
+    # Tras el commit: una recarga antes vería aún los datos viejos
+    transaction.on_commit(thresholds.invalidate)
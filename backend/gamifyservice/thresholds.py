@@ -0,0 +1,76 @@
+"""
+Tablas de umbrales de rangos y badges en memoria del proceso.
+
+Se cargan ordenadas por puntos y se resuelven con ``bisect``: el rango de un
+total y las badges cuyo umbral se cruzó en un premio (antes < umbral <= después)
+no consultan la base. Las señales de ``Rank`` y ``BadgeDefinition`` suben la
+versión local; el TTL acota cuánto tarda en verse un cambio hecho desde otro
+worker.
+"""
+import os
+import threading
+import time
+from bisect import bisect_right
+from typing import NamedTuple
+
+from .models import BadgeDefinition, Rank
+
+
+TTL = float(os.environ.get('GAMIFY_THRESHOLDS_TTL', '60'))
+
+
+class Tables(NamedTuple):
+    version: int
+    rank_points: list
+    ranks: list
+    badge_points: list
+    badges: list
+    by_code: dict
+
+    def rank_for(self, points):
+        """(id, nombre) del rango más alto alcanzado o None."""
+        i = bisect_right(self.rank_points, points)
+        return self.ranks[i - 1] if i else None
+
+    def crossed(self, before, after):
+        """Definiciones de badge con umbral en (before, after]."""
+        return self.badges[bisect_right(self.badge_points, before):bisect_right(self.badge_points, after)]
+
+
+_lock = threading.Lock()
+_version = 0
+_tables = None
+_loaded_at = 0.0
+
+
+def _load(version):
+    ranks = list(Rank.objects.order_by('min_points', 'pk').values_list('min_points', 'pk', 'name'))
+    badges = list(BadgeDefinition.objects.order_by('threshold_points', 'pk'))
+    return Tables(
+        version=version,
+        rank_points=[points for points, _, _ in ranks],
+        ranks=[(pk, name) for _, pk, name in ranks],
+        badge_points=[b.threshold_points for b in badges],
+        badges=badges,
+        by_code={b.code: b for b in badges},
+    )
+
+
+def get():
+    global _tables, _loaded_at
+    tables = _tables
+    if tables is not None and tables.version == _version and time.monotonic() - _loaded_at < TTL:
+        return tables
+    version = _version
+    tables = _load(version)
+    with _lock:
+        # Si hubo otra invalidación durante la carga, la próxima llamada recarga
+        if _version == version:
+            _tables, _loaded_at = tables, time.monotonic()
+    return tables
+
+
+def invalidate():
+    global _version
+    with _lock:
+        _version += 1
@@ -1,11 +1,14 @@
 from django.urls import path
-from .views import award, metrics, lti_launch, ranking, badges_me, missions_progress
+from .views import award, award_bulk, metrics, lti_launch, ranking, leaderboard_page, leaderboard_me, badges_me, missions_progress
 
 urlpatterns = [
     path('award', award),
+    path('award/bulk', award_bulk),
     path('metrics', metrics),
     path('lti/launch', lti_launch),
     path('ranking', ranking),
+    path('leaderboard', leaderboard_page),
+    path('leaderboard/me', leaderboard_me),
     path('badges/me', badges_me),
     path('missions/progress', missions_progress),
 ]
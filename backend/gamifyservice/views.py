@@ -1,6 +1,7 @@
 import base64
 import hashlib
 import hmac
+import os
 import time
 from urllib.parse import quote, urlencode
 
@@ -13,7 +14,10 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from django.contrib.auth import get_user_model
-from .models import Point, Badge, UserBadge, UserScore, Rank, BadgeDefinition, Mission, UserProgress, activity_completed
+from .models import UserBadge, UserScore, Mission, UserProgress
+from . import leaderboard
+from .ledger import ledger_total
+from .scoring import add_points, award_many, grant_badge, grant_crossed_badges
 
 User = get_user_model()
 
@@ -21,17 +25,7 @@ def _update_user_score(user, points_to_add):
     """
     Helper para actualizar el puntaje y rango de un usuario de forma centralizada.
     """
-    if not points_to_add:
-        return None, None
-
-    Point.objects.create(user=user, value=points_to_add)
-    score, _ = UserScore.objects.get_or_create(user=user)
-    score.points = int(score.points or 0) + points_to_add
-    candidate_rank = Rank.objects.filter(min_points__lte=score.points).order_by('-min_points').first()
-    if candidate_rank:
-        score.rank = candidate_rank
-    score.save()
-    return score.points, getattr(score.rank, 'name', None)
+    return add_points(user, points_to_add)
 
 award_request = openapi.Schema(
     type=openapi.TYPE_OBJECT,
@@ -62,34 +56,56 @@ def award(request):
     puntos = int(request.data.get('puntos', 0))
     actividad_id = request.data.get('actividad_id')
     badge_code = request.data.get('badge_code')
-    new_total = None
-    current_rank = None
     awarded_badge = None
 
-    new_total, current_rank = _update_user_score(user, puntos)
+    accrual = _update_user_score(user, puntos)
 
     if badge_code:
-        defn = BadgeDefinition.objects.filter(code=badge_code).first()
-        name = defn.name if defn else badge_code
-        badge, _ = Badge.objects.get_or_create(name=name, defaults={'description': defn.description if defn else ''})
-        UserBadge.objects.get_or_create(user=user, badge=badge)
-        awarded_badge = badge.name
+        awarded_badge = grant_badge(user, badge_code)
     else:
-        score = UserScore.objects.filter(user=user).first()
-        if score:
-            for defn in BadgeDefinition.objects.all():
-                if score.points >= defn.threshold_points:
-                    badge, _ = Badge.objects.get_or_create(name=defn.name, defaults={'description': defn.description})
-                    UserBadge.objects.get_or_create(user=user, badge=badge)
+        # Solo las badges cuyo umbral cruzó este premio
+        grant_crossed_badges(user, accrual)
 
-    return Response({'awarded_points': puntos, 'new_total': new_total, 'rank': current_rank, 'awarded_badge': awarded_badge})
+    return Response({'awarded_points': puntos, 'new_total': accrual.total, 'rank': accrual.rank, 'awarded_badge': awarded_badge})
+
+
+BULK_MAX_ENTRIES = int(os.environ.get('GAMIFY_BULK_MAX_ENTRIES', '500'))
+
+award_bulk_request = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        'entries': openapi.Schema(type=openapi.TYPE_ARRAY, items=award_request),
+    },
+)
+award_bulk_response = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        'results': openapi.Schema(type=openapi.TYPE_ARRAY, items=award_response),
+    },
+)
+
+
+@swagger_auto_schema(method='post', request_body=award_bulk_request, responses={200: award_bulk_response})
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def award_bulk(request):
+    role = getattr(getattr(request.user, 'role', None), 'role', 'student')
+    if role not in ['teacher', 'expert']:
+        return Response({'detail': 'no autorizado'}, status=403)
+    entries = request.data.get('entries')
+    if not isinstance(entries, list) or not entries:
+        return Response({'detail': 'entries debe ser una lista no vacía'}, status=400)
+    if len(entries) > BULK_MAX_ENTRIES:
+        return Response({'detail': f'máximo {BULK_MAX_ENTRIES} entradas por lote'}, status=400)
+    return Response({'results': award_many(entries)})
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def metrics(request):
     user = request.user
-    total_points = sum(p.value for p in Point.objects.filter(user=user))
+    # Snapshots compactados + cola reciente, sumados en SQL
+    total_points = ledger_total(user)
     badges = list(UserBadge.objects.filter(user=user).values_list('badge__name', flat=True))
     return Response({'total_points': total_points, 'badges': badges})
 
@@ -97,9 +113,46 @@ def metrics(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def ranking(request):
-    qs = UserScore.objects.select_related('rank').order_by('-points')[:50]
-    data = [{'user_id': s.user_id, 'puntos': s.points, 'rango': (s.rank.name if s.rank else None)} for s in qs]
-    return Response(data)
+    rows, _ = leaderboard.page(limit=leaderboard.PAGE_SIZE)
+    return Response(rows)
+
+
+@swagger_auto_schema(method='get', manual_parameters=[
+    openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+    openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+])
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def leaderboard_page(request):
+    cursor = request.GET.get('cursor')
+    if cursor and not leaderboard.decode_cursor(cursor):
+        return Response({'detail': 'cursor inválido'}, status=400)
+    try:
+        limit = int(request.GET.get('limit') or leaderboard.PAGE_SIZE)
+    except ValueError:
+        return Response({'detail': 'limit inválido'}, status=400)
+    rows, next_cursor = leaderboard.page(cursor, limit)
+    return Response({'results': rows, 'next': next_cursor, 'total': leaderboard.positions.size()})
+
+
+@swagger_auto_schema(method='get', manual_parameters=[
+    openapi.Parameter('radius', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+])
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def leaderboard_me(request):
+    score = UserScore.objects.filter(user=request.user).select_related('rank').first()
+    if not score:
+        return Response({'position': None, 'points': 0, 'results': []})
+    try:
+        radius = max(0, min(int(request.GET.get('radius') or 5), 25))
+    except ValueError:
+        return Response({'detail': 'radius inválido'}, status=400)
+    return Response({
+        'position': leaderboard.positions.position(score.points),
+        'points': score.points,
+        'results': leaderboard.around(score, radius),
+    })
 
 
 @api_view(['GET'])
@@ -0,0 +1,191 @@
+"""
+Control de admisión para la inferencia local (Ollama).
+
+Limita las generaciones simultáneas; las demás esperan en una cola con
+turnos rotativos por usuario, de modo que quien envía muchas preguntas no
+acapara el modelo. Si la cola está llena, o la espera supera el máximo, se
+lanza ``Overloaded`` con un Retry-After estimado.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from rest_framework.response import Response
+
+
+MAX_CONCURRENCY = int(os.environ.get('OLLAMA_MAX_CONCURRENCY', '1'))
+MAX_QUEUE = int(os.environ.get('LLM_QUEUE_MAX', '16'))
+MAX_PER_USER = int(os.environ.get('LLM_QUEUE_MAX_PER_USER', '2'))
+MAX_WAIT = float(os.environ.get('LLM_QUEUE_MAX_WAIT', '20'))
+TRUSTED_PROXIES = int(os.environ.get('LLM_TRUSTED_PROXIES', '0'))
+WAIT_SAMPLES = 500
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after, reason='cola llena'):
+        super().__init__(f'{reason}; reintentar en {retry_after} s')
+        self.retry_after = retry_after
+
+
+class Reservation:
+    """Cupo ya concedido; se libera una sola vez, lo use quien lo use."""
+
+    def __init__(self, limiter):
+        self._limiter = limiter
+        self._start = time.monotonic()
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._limiter.release(time.monotonic() - self._start)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class _Ticket:
+    __slots__ = ('user', 'granted')
+
+    def __init__(self, user):
+        self.user = user
+        self.granted = False
+
+
+class FairLimiter:
+    def __init__(self, limit=MAX_CONCURRENCY, max_queue=MAX_QUEUE, max_per_user=MAX_PER_USER, max_wait=MAX_WAIT):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._active = 0
+        # usuario -> tickets en espera; el orden de las claves es el turno rotativo
+        self._queues = OrderedDict()
+        self._depth = 0
+        self._service_s = 5.0
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._counters = {'admitted': 0, 'queued': 0, 'rejected': 0, 'timeouts': 0}
+
+    def retry_after(self):
+        return max(1, math.ceil(self._service_s * (self._depth + 1) / self.limit))
+
+    def _grant_next(self):
+        if not self._queues:
+            return False
+        user, tickets = next(iter(self._queues.items()))
+        ticket = tickets.popleft()
+        del self._queues[user]
+        if tickets:
+            # Pasa al final: el siguiente turno es de otro usuario
+            self._queues[user] = tickets
+        self._depth -= 1
+        ticket.granted = True
+        self._cond.notify_all()
+        return True
+
+    def _remove(self, ticket):
+        tickets = self._queues.get(ticket.user)
+        if tickets and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del self._queues[ticket.user]
+            self._depth -= 1
+
+    def acquire(self, user):
+        start = time.monotonic()
+        with self._cond:
+            if self._active < self.limit and not self._depth:
+                self._active += 1
+                self._counters['admitted'] += 1
+                self._waits.append(0.0)
+                return
+            if self._depth >= self.max_queue or len(self._queues.get(user, ())) >= self.max_per_user:
+                self._counters['rejected'] += 1
+                raise Overloaded(self.retry_after())
+            ticket = _Ticket(user)
+            self._queues.setdefault(user, deque()).append(ticket)
+            self._depth += 1
+            self._counters['queued'] += 1
+            deadline = start + self.max_wait
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._remove(ticket)
+                    self._counters['timeouts'] += 1
+                    raise Overloaded(self.retry_after(), 'espera máxima superada')
+                self._cond.wait(remaining)
+            # El cupo se hereda de quien lo liberó: _active no cambia
+            self._counters['admitted'] += 1
+            self._waits.append(time.monotonic() - start)
+
+    def release(self, service_s=None):
+        with self._cond:
+            if service_s is not None:
+                # Media móvil del tiempo de generación para estimar Retry-After
+                self._service_s = 0.8 * self._service_s + 0.2 * service_s
+            if not self._grant_next():
+                self._active -= 1
+
+    def reserve(self, user):
+        self.acquire(user)
+        return Reservation(self)
+
+    def try_reserve(self):
+        """Cupo solo si hay uno libre ya (sin cola); None si no."""
+        with self._cond:
+            if self._active >= self.limit or self._depth:
+                return None
+            self._active += 1
+            self._counters['admitted'] += 1
+            self._waits.append(0.0)
+        return Reservation(self)
+
+    @contextmanager
+    def slot(self, user):
+        with self.reserve(user):
+            yield
+
+    def stats(self):
+        with self._cond:
+            waits = sorted(self._waits)
+            data = dict(self._counters, active=self._active, depth=self._depth, limit=self.limit,
+                        service_ms=round(self._service_s * 1000, 1))
+        data['wait_ms'] = {
+            'p50': round(waits[len(waits) // 2] * 1000, 1) if waits else None,
+            'p95': round(waits[min(len(waits) - 1, int(0.95 * len(waits)))] * 1000, 1) if waits else None,
+        }
+        return data
+
+
+def client_key(request):
+    """
+    Identidad para el reparto justo: el usuario autenticado o la IP. De
+    X-Forwarded-For solo se cree el salto que agregó el último proxy propio
+    (``LLM_TRUSTED_PROXIES`` proxies delante de Django); sin proxies se usa
+    REMOTE_ADDR. Los saltos anteriores los controla el cliente.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    hops = [h.strip() for h in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if h.strip()]
+    if TRUSTED_PROXIES and len(hops) >= TRUSTED_PROXIES:
+        return f'ip:{hops[-TRUSTED_PROXIES]}'
+    return 'ip:' + request.META.get('REMOTE_ADDR', '')
+
+
+def overloaded_response(exc):
+    return Response(
+        {'error': 'El asistente está atendiendo muchas consultas. Intenta de nuevo en unos segundos.', 'retryAfter': exc.retry_after},
+        status=429,
+        headers={'Retry-After': str(exc.retry_after)},
+    )
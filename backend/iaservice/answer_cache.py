@@ -0,0 +1,184 @@
+"""
+Caché de respuestas del chat por rol.
+
+La clave es (rol, versión del prompt de sistema, pregunta normalizada, modelo);
+las entradas vencen por TTL y, al llenarse, se expulsa la usada hace más
+tiempo. Opcionalmente (``CHAT_CACHE_FUZZY``) una pregunta casi igual a otra
+ya respondida ("qué come la sachavaca" / "qué come una sachavaca") reutiliza
+su respuesta: cada pregunta se representa con un vector TF-IDF de trigramas de
+caracteres (hashing trick) y se compara por coseno con NumPy. Además deben
+coincidir sus palabras de contenido, negaciones incluidas: el coseno solo no
+distingue "dónde vive" de "dónde no vive".
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+
+TTL = int(os.environ.get('CHAT_CACHE_TTL', '86400'))
+MAX_ENTRIES = int(os.environ.get('CHAT_CACHE_MAX_ENTRIES', '1000'))
+SIMILARITY = float(os.environ.get('CHAT_CACHE_SIMILARITY', '0.9'))
+FUZZY = os.environ.get('CHAT_CACHE_FUZZY', 'false').lower() == 'true'
+VECTOR_DIM = 2048
+# Palabras que no cambian la pregunta; negaciones y cuantificadores no van aquí
+FILLER = frozenset('a al de del el la las lo los un una unos unas y e o u hola por favor dime me puedes podrias sabes'.split())
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', (text or '').lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(re.findall(r'[a-z0-9ñ]+', text))
+
+
+def prompt_version(system_prompt):
+    # Cambiar el texto del prompt invalida por sí solo las respuestas anteriores
+    return hashlib.sha1(system_prompt.encode('utf-8')).hexdigest()[:12]
+
+
+def _content(normalized):
+    # Plural simple: "sachavacas" -> "sachavaca"
+    return frozenset(w[:-1] if len(w) > 4 and w.endswith('s') else w for w in normalized.split() if w not in FILLER)
+
+
+def _vector(normalized):
+    vec = np.zeros(VECTOR_DIM, dtype=np.float32)
+    for word in normalized.split():
+        padded = f' {word} '
+        for i in range(len(padded) - 2):
+            digest = hashlib.blake2b(padded[i:i + 3].encode('utf-8'), digest_size=4).digest()
+            vec[int.from_bytes(digest, 'little') % VECTOR_DIM] += 1
+    return vec
+
+
+class AnswerCache:
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL, similarity=SIMILARITY, fuzzy=FUZZY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.fuzzy = fuzzy
+        self._lock = threading.Lock()
+        # clave -> (respuesta, vence, fila)
+        self._entries = OrderedDict()
+        self._row_keys = [None] * max_entries
+        self._row_content = [None] * max_entries
+        # Matrices de la búsqueda aproximada (~16 MB con los valores por defecto):
+        # se reservan con la primera entrada y solo si ``fuzzy`` está activo
+        self._tf = None
+        self._tf_sq = None
+        self._df = None
+        self._groups = None
+        self._group_ids = {}
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._counters = {'hits': 0, 'similar_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def _matrices(self):
+        if self._tf is None:
+            self._tf = np.zeros((self.max_entries, VECTOR_DIM), dtype=np.float32)
+            self._tf_sq = np.zeros((self.max_entries, VECTOR_DIM), dtype=np.float32)
+            self._df = np.zeros(VECTOR_DIM, dtype=np.float32)
+            self._groups = np.full(self.max_entries, -1, dtype=np.int64)
+
+    def _group(self, group):
+        return self._group_ids.setdefault(group, len(self._group_ids))
+
+    def _drop(self, key):
+        _, _, row = self._entries.pop(key)
+        self._row_keys[row] = None
+        self._row_content[row] = None
+        if self._tf is not None:
+            self._df -= self._tf[row] > 0
+            self._tf[row] = 0
+            self._tf_sq[row] = 0
+            self._groups[row] = -1
+        self._free.append(row)
+
+    def _similar(self, group, normalized, now):
+        if self._tf is None:
+            return None
+        rows = np.flatnonzero(self._groups == self._group_ids.get(group, -2))
+        if not rows.size:
+            return None
+        idf = np.log((len(self._entries) + 1) / (self._df + 1)) + 1
+        query = _vector(normalized) * idf
+        norm = np.linalg.norm(query)
+        if not norm:
+            return None
+        # El producto solo necesita las columnas presentes en la pregunta
+        cols = np.flatnonzero(query)
+        dots = self._tf[np.ix_(rows, cols)] @ (query[cols] * idf[cols])
+        doc_norms = np.sqrt((self._tf_sq @ (idf * idf))[rows])
+        scores = dots / (norm * np.maximum(doc_norms, 1e-9))
+        content = _content(normalized)
+        for i in np.argsort(-scores):
+            if scores[i] < self.similarity:
+                break
+            if self._row_content[rows[i]] != content:
+                continue
+            key = self._row_keys[rows[i]]
+            answer, expires, _ = self._entries[key]
+            return (key, answer) if expires > now else None
+        return None
+
+    def get(self, role, version, message, model):
+        normalized = normalize(message)
+        if not normalized:
+            return None
+        group = (role, version, model)
+        key = group + (normalized,)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] <= now:
+                self._drop(key)
+                entry = None
+            if entry:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                return entry[0]
+            found = self._similar(group, normalized, now) if self.fuzzy else None
+            if found:
+                self._entries.move_to_end(found[0])
+                self._counters['similar_hits'] += 1
+                return found[1]
+            self._counters['misses'] += 1
+            return None
+
+    def set(self, role, version, message, model, answer):
+        normalized = normalize(message)
+        if not normalized or not answer:
+            return
+        group = (role, version, model)
+        key = group + (normalized,)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            while not self._free:
+                self._drop(next(iter(self._entries)))
+                self._counters['evictions'] += 1
+            row = self._free.pop()
+            if self.fuzzy:
+                self._matrices()
+                self._tf[row] = _vector(normalized)
+                self._tf_sq[row] = self._tf[row] ** 2
+                self._df += self._tf[row] > 0
+                self._groups[row] = self._group(group)
+                self._row_content[row] = _content(normalized)
+            self._entries[key] = (answer, time.monotonic() + self.ttl, row)
+            self._row_keys[row] = key
+            self._counters['stores'] += 1
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._counters, entries=len(self._entries))
+        lookups = data['hits'] + data['similar_hits'] + data['misses']
+        data['hit_ratio'] = round((data['hits'] + data['similar_hits']) / lookups, 3) if lookups else None
+        return data
+
+
+answers = AnswerCache()
@@ -0,0 +1,112 @@
+"""
+Conversaciones del chat guardadas en el servidor.
+
+El prompt se arma con un presupuesto de tokens: el prompt de sistema, un
+resumen acumulado de los turnos antiguos y los últimos N turnos que quepan.
+Los turnos que salen de la ventana se condensan en el resumen (la primera
+oración de cada uno), sin llamadas extra al modelo.
+"""
+import math
+import os
+import re
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Conversation, ConversationTurn
+
+
+TOKEN_BUDGET = int(os.environ.get('LLM_PROMPT_TOKEN_BUDGET', '1500'))
+HISTORY_TURNS = int(os.environ.get('LLM_HISTORY_TURNS', '8'))
+SUMMARY_TOKENS = int(os.environ.get('LLM_SUMMARY_TOKENS', '300'))
+SUMMARY_LINE_CHARS = 160
+# Días sin actividad tras los que se borra una conversación anónima
+ANONYMOUS_RETENTION_DAYS = int(os.environ.get('LLM_ANONYMOUS_CONVERSATION_DAYS', '7'))
+ROLES = ('user', 'assistant')
+
+
+def estimate_tokens(text):
+    # Aproximación de ~4 caracteres por token; no hay tokenizador local
+    return math.ceil(len(text or '') / 4)
+
+
+def get_conversation(conversation_id, user):
+    """Devuelve la conversación si existe y pertenece al usuario (o es anónima)."""
+    try:
+        conv = Conversation.objects.get(pk=conversation_id)
+    except (Conversation.DoesNotExist, ValidationError, ValueError, TypeError):
+        return None
+    if conv.user_id and conv.user_id != getattr(user, 'id', None):
+        return None
+    return conv
+
+
+def start_conversation(user, history=None):
+    conv = Conversation.objects.create(user=user if getattr(user, 'is_authenticated', False) else None)
+    turns = []
+    for h in history or []:
+        role = h.get('role')
+        text = h.get('text') or h.get('content') or ''
+        if role in ROLES and text:
+            turns.append(ConversationTurn(conversation=conv, role=role, content=text, tokens=estimate_tokens(text)))
+    if turns:
+        ConversationTurn.objects.bulk_create(turns)
+        _fold(conv)
+    return conv
+
+
+def build_messages(conv, system_prompt, message, budget=TOKEN_BUDGET):
+    msgs = [{'role': 'system', 'content': system_prompt}]
+    if conv.summary:
+        msgs.append({'role': 'system', 'content': f'Resumen de la conversación anterior:\n{conv.summary}'})
+    used = sum(estimate_tokens(m['content']) for m in msgs) + estimate_tokens(message)
+    recent = []
+    for turn in conv.turns.order_by('-id')[:HISTORY_TURNS]:
+        if used + turn.tokens > budget:
+            break
+        used += turn.tokens
+        recent.append({'role': turn.role, 'content': turn.content})
+    msgs.extend(reversed(recent))
+    msgs.append({'role': 'user', 'content': message})
+    return msgs
+
+
+def _condense(turn):
+    label = 'Usuario' if turn.role == 'user' else 'Asistente'
+    text = ' '.join(turn.content.split())
+    sentence = re.split(r'(?<=[.!?])\s', text, maxsplit=1)[0]
+    return f'{label}: {sentence[:SUMMARY_LINE_CHARS]}'
+
+
+def _fold(conv):
+    """Pasa al resumen los turnos que quedaron fuera de la ventana reciente."""
+    fold_until = conv.turns.count() - HISTORY_TURNS
+    if fold_until <= conv.summarized_turns:
+        return False
+    turns = conv.turns.order_by('id')[conv.summarized_turns:fold_until]
+    lines = [line for line in conv.summary.split('\n') if line] + [_condense(t) for t in turns]
+    while len(lines) > 1 and estimate_tokens('\n'.join(lines)) > SUMMARY_TOKENS:
+        lines.pop(0)
+    conv.summary = '\n'.join(lines)
+    conv.summarized_turns = fold_until
+    conv.save(update_fields=['summary', 'summarized_turns', 'updated_at'])
+    return True
+
+
+def append_exchange(conv, message, reply):
+    with transaction.atomic():
+        ConversationTurn.objects.bulk_create([
+            ConversationTurn(conversation=conv, role='user', content=message, tokens=estimate_tokens(message)),
+            ConversationTurn(conversation=conv, role='assistant', content=reply, tokens=estimate_tokens(reply)),
+        ])
+        if not _fold(conv):
+            conv.save(update_fields=['updated_at'])
+
+
+def prune(days=ANONYMOUS_RETENTION_DAYS):
+    """Borra las conversaciones sin usuario inactivas hace más de ``days`` días; devuelve cuántas."""
+    stale = Conversation.objects.filter(user__isnull=True, updated_at__lt=timezone.now() - timedelta(days=days))
+    deleted, by_model = stale.delete()
+    return by_model.get(Conversation._meta.label, 0)
@@ -0,0 +1,210 @@
+"""
+Llamadas a los modelos de lenguaje (Groq y Ollama) con respuesta en streaming.
+
+Los generadores ``groq_stream`` y ``ollama_stream`` entregan los fragmentos de
+texto según llegan del proveedor; ``sse_response`` los reenvía al cliente como
+Server-Sent Events. Se mide la latencia hasta el primer token por proveedor.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import closing
+
+from django.http import StreamingHttpResponse
+
+from naturein import http_client
+
+
+GROQ_URL = 'https://api.groq.com/openai/v1/chat/completions'
+# (conexión, lectura entre fragmentos): sin límite para la generación completa
+STREAM_TIMEOUT = (5, int(os.environ.get('LLM_STREAM_READ_TIMEOUT', '30')))
+LATENCY_SAMPLES = 500
+
+
+class Cancelled(Exception):
+    """La generación se abortó porque otro backend ya respondió."""
+
+
+def groq_model():
+    return os.environ.get('GROQ_MODEL', 'llama-3.1-8b-instant')
+
+
+def ollama_base():
+    return os.environ.get('LLM_BASE_URL', 'http://localhost:11434')
+
+
+def ollama_model():
+    return os.environ.get('LLM_MODEL', 'llama3:latest')
+
+
+def wants_stream(request):
+    flag = request.data.get('stream') if hasattr(request.data, 'get') else None
+    flag = flag if flag is not None else request.GET.get('stream')
+    return str(flag).lower() in ('1', 'true', 'yes')
+
+
+def groq_complete(messages, api_key, model=None, timeout=60):
+    r = http_client.post(
+        GROQ_URL,
+        headers={'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'},
+        json={'model': model or groq_model(), 'messages': messages},
+        timeout=timeout,
+    )
+    r.raise_for_status()
+    choice = (r.json().get('choices') or [{}])[0]
+    return (choice.get('message') or {}).get('content') or ''
+
+
+def ollama_complete(messages, options=None, model=None, timeout=60, cancel=None):
+    if cancel is not None:
+        # En streaming para poder cortar entre fragmentos: al cerrar la conexión Ollama deja de generar
+        parts = []
+        with closing(ollama_stream(messages, options, model, timeout=(STREAM_TIMEOUT[0], timeout))) as chunks:
+            for delta in chunks:
+                if cancel.is_set():
+                    raise Cancelled('ollama: generación cancelada')
+                parts.append(delta)
+        return ''.join(parts)
+    r = http_client.post(
+        f'{ollama_base()}/api/chat',
+        json={'model': model or ollama_model(), 'messages': messages, 'stream': False, 'options': options or {}},
+        timeout=timeout,
+    )
+    r.raise_for_status()
+    return (r.json().get('message') or {}).get('content') or ''
+
+
+def groq_stream(messages, api_key, model=None):
+    r = http_client.post(
+        GROQ_URL,
+        headers={'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'},
+        json={'model': model or groq_model(), 'messages': messages, 'stream': True},
+        timeout=STREAM_TIMEOUT,
+        stream=True,
+    )
+    with r:
+        r.raise_for_status()
+        for line in r.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            payload = line[5:].strip()
+            if payload == '[DONE]':
+                break
+            choice = (json.loads(payload).get('choices') or [{}])[0]
+            delta = (choice.get('delta') or {}).get('content')
+            if delta:
+                yield delta
+
+
+def ollama_stream(messages, options=None, model=None, timeout=STREAM_TIMEOUT):
+    r = http_client.post(
+        f'{ollama_base()}/api/chat',
+        json={'model': model or ollama_model(), 'messages': messages, 'stream': True, 'options': options or {}},
+        timeout=timeout,
+        stream=True,
+    )
+    with r:
+        r.raise_for_status()
+        for line in r.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            chunk = json.loads(line)
+            delta = (chunk.get('message') or {}).get('content')
+            if delta:
+                yield delta
+            if chunk.get('done'):
+                break
+
+
+_lock = threading.Lock()
+_first_token = defaultdict(lambda: deque(maxlen=LATENCY_SAMPLES))
+_counters = defaultdict(lambda: {'streams': 0, 'errors': 0})
+
+
+def _record(provider, first_token_ms=None, error=False):
+    with _lock:
+        _counters[provider]['streams'] += 1
+        _counters[provider]['errors'] += int(error)
+        if first_token_ms is not None:
+            _first_token[provider].append(first_token_ms)
+
+
+def timed(provider, chunks):
+    """Envuelve un generador de fragmentos y registra la latencia al primer token."""
+    start = time.monotonic()
+    first = None
+    try:
+        for chunk in chunks:
+            if first is None:
+                first = (time.monotonic() - start) * 1000
+            yield chunk
+    except Exception:
+        _record(provider, first, error=True)
+        raise
+    _record(provider, first)
+
+
+def _percentile(values, q):
+    return round(values[min(len(values) - 1, int(q * len(values)))], 1) if values else None
+
+
+def stats():
+    with _lock:
+        data = {p: (dict(c), sorted(_first_token[p])) for p, c in _counters.items()}
+    return {
+        provider: {
+            **counters,
+            'first_token_ms': {'p50': _percentile(samples, 0.5), 'p95': _percentile(samples, 0.95), 'max': _percentile(samples, 1)},
+        }
+        for provider, (counters, samples) in data.items()
+    }
+
+
+def sse_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+def sse_stream(sources, fallback='', on_done=None):
+    """
+    Reenvía como SSE el primer proveedor que responda. ``sources`` es una lista
+    de (nombre, función sin argumentos que devuelve el generador). Si un
+    proveedor falla antes del primer token se prueba el siguiente.
+    ``on_done`` recibe la respuesta completa cuando termina sin errores.
+    """
+    for provider, open_stream in sources:
+        parts = []
+        try:
+            for delta in timed(provider, open_stream()):
+                parts.append(delta)
+                yield sse_event('token', {'delta': delta})
+        except Exception:
+            if not parts:
+                continue
+            yield sse_event('error', {'detail': 'La respuesta del modelo se interrumpió.'})
+            yield sse_event('done', {'reply': ''.join(parts), 'provider': provider, 'complete': False})
+            return
+        reply = ''.join(parts)
+        if on_done and reply:
+            on_done(reply)
+        yield sse_event('done', {'reply': reply, 'provider': provider, 'complete': True})
+        return
+    if fallback:
+        yield sse_event('token', {'delta': fallback})
+    else:
+        yield sse_event('error', {'detail': 'No se pudo conectar con el modelo.'})
+    yield sse_event('done', {'reply': fallback or '', 'provider': None, 'complete': False})
+
+
+def sse_cached(reply, provider='cache'):
+    yield sse_event('token', {'delta': reply})
+    yield sse_event('done', {'reply': reply, 'provider': provider, 'complete': True})
+
+
+def sse_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    # Evita que un proxy nginx acumule el stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
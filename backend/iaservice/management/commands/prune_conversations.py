@@ -0,0 +1,18 @@
+"""
+Borra las conversaciones anónimas del chat sin actividad reciente (y sus
+turnos). Las de usuarios autenticados se conservan. Pensado para cron.
+"""
+from django.core.management.base import BaseCommand
+
+from iaservice.conversations import ANONYMOUS_RETENTION_DAYS, prune
+
+
+class Command(BaseCommand):
+    help = 'Borra las conversaciones anónimas inactivas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=ANONYMOUS_RETENTION_DAYS, help='Días sin actividad que se conservan')
+
+    def handle(self, *args, **options):
+        deleted = prune(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"Borradas {deleted} conversaciones anónimas inactivas hace más de {options['days']} días"))
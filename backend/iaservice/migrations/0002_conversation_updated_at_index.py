@@ -0,0 +1,19 @@
+# Generated by Django 5.1.3 on 2026-10-18 16:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iaservice', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['updated_at'], name='iaservice_c_updated_237542_idx'),
+        ),
+    ]
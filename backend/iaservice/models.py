@@ -0,0 +1,30 @@
+import uuid
+
+from django.conf import settings
+from django.db import models
+
+
+class Conversation(models.Model):
+    """Conversación del chat guardada en el servidor; el cliente solo envía su id."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.CASCADE)
+    # Resumen acumulado de los turnos que ya salieron de la ventana reciente
+    summary = models.TextField(blank=True)
+    summarized_turns = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Limpieza de conversaciones anónimas inactivas (prune_conversations)
+        indexes = [models.Index(fields=['updated_at'])]
+
+
+class ConversationTurn(models.Model):
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='turns')
+    role = models.CharField(max_length=16)
+    content = models.TextField()
+    tokens = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['conversation', 'id'])]
@@ -0,0 +1,303 @@
+"""
+Recuperación de conocimiento local para los chatbots (sin red).
+
+Índice BM25 en NumPy sobre las fichas de especies (``SpeciesProfile``), la
+guía ``docs/lugares_turiscos.md`` y las tablas de lugares e instituciones.
+Los mejores pasajes se inyectan en el prompt; si la pregunta pide un dato
+concreto (horario, ubicación, teléfono...) de un pasaje que gana con claridad,
+se responde directamente sin llamar al modelo.
+"""
+import math
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .answer_cache import normalize
+
+
+DOCS_PATH = Path(os.environ.get('CHAT_KNOWLEDGE_DOC', str(Path(settings.BASE_DIR).parent / 'docs' / 'lugares_turiscos.md')))
+REFRESH_SECONDS = int(os.environ.get('CHAT_KNOWLEDGE_REFRESH_SECONDS', '300'))
+TOP_K = int(os.environ.get('CHAT_KNOWLEDGE_TOP_K', '3'))
+CONTEXT_CHARS = int(os.environ.get('CHAT_KNOWLEDGE_CONTEXT_CHARS', '1500'))
+FAQ_MIN_SCORE = float(os.environ.get('CHAT_FAQ_MIN_SCORE', '3'))
+# Fracción del nombre del lugar/institución que debe aparecer en la pregunta
+FAQ_TITLE_COVERAGE = float(os.environ.get('CHAT_FAQ_TITLE_COVERAGE', '0.6'))
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = frozenset('''
+    a al algo como con cual cuales cuando de del donde el ella en entre es esta este esto ha hay la las le les lo los
+    mas me mi muy no o para pero por que se si sin sobre su sus te tiene tu un una uno unos unas y ya yo
+    puedo puedes quiero saber dime decir conoces sabes hola favor gracias
+'''.split())
+
+# Palabras de la pregunta que indican qué campo del pasaje se pide
+INTENTS = {
+    'horario': ('horario', 'hora', 'abre', 'abren', 'cierra', 'cierran', 'atiende', 'atienden'),
+    'ubicacion': ('ubica', 'ubicado', 'ubicada', 'ubicacion', 'queda', 'direccion'),
+    'llegar': ('llegar', 'llego', 'ir', 'voy'),
+    'llevar': ('llevar', 'llevo', 'equipo'),
+    'flora_fauna': ('flora', 'fauna', 'animal', 'animale', 'planta', 'especie'),
+    'telefono': ('telefono', 'numero', 'llamar', 'contacto'),
+}
+# Secciones de la guía de lugares -> campo
+DOC_FIELDS = {
+    'descripcion del lugar': 'descripcion',
+    'ubicacion': 'ubicacion',
+    'horarios': 'horario',
+    'recomendaciones': 'recomendaciones',
+    'flora fauna': 'flora_fauna',
+}
+
+
+class Passage(NamedTuple):
+    source: str
+    title: str
+    text: str
+    fields: dict
+
+
+def tokenize(text):
+    tokens = []
+    for token in normalize(text).split():
+        if token in STOPWORDS or len(token) < 2:
+            continue
+        # Plural simple: "sachavacas" -> "sachavaca"
+        if len(token) > 4 and token.endswith('s'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, passages):
+        self.passages = passages
+        self.vocab = {}
+        postings = []
+        lengths = np.zeros(len(passages), dtype=np.float32)
+        for doc_id, passage in enumerate(passages):
+            tokens = tokenize(f'{passage.title} {passage.title} {passage.text}')
+            lengths[doc_id] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                term = self.vocab.setdefault(token, len(self.vocab))
+                if term == len(postings):
+                    postings.append(([], []))
+                postings[term][0].append(doc_id)
+                postings[term][1].append(tf)
+        avgdl = float(lengths.mean()) if len(passages) else 0.0
+        n = len(passages)
+        # Peso BM25 precalculado por (término, documento): la consulta solo suma
+        self.postings = []
+        for docs, tfs in postings:
+            docs = np.asarray(docs, dtype=np.int32)
+            tfs = np.asarray(tfs, dtype=np.float32)
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[docs] / (avgdl or 1))
+            self.postings.append((docs, idf * tfs * (BM25_K1 + 1) / (tfs + norm)))
+
+    def __len__(self):
+        return len(self.passages)
+
+    def search(self, query, k=TOP_K):
+        scores = np.zeros(len(self.passages), dtype=np.float32)
+        for token in set(tokenize(query)):
+            term = self.vocab.get(token)
+            if term is not None:
+                docs, weights = self.postings[term]
+                scores[docs] += weights
+        if not scores.any():
+            return []
+        top = np.argsort(-scores)[:k]
+        return [(float(scores[i]), self.passages[i]) for i in top if scores[i] > 0]
+
+
+def _doc_passages(path):
+    try:
+        text = path.read_text(encoding='utf-8')
+    except OSError:
+        return []
+    passages = []
+    for block in re.split(r'\n(?=\d+\.\s)', text):
+        lines = [line.strip() for line in block.strip().split('\n')]
+        match = re.match(r'\d+\.\s+(.*)', lines[0]) if lines else None
+        if not match:
+            continue
+        fields, current = {}, None
+        for line in lines[1:]:
+            key = DOC_FIELDS.get(normalize(line))
+            if key:
+                current = key
+            elif line and current:
+                fields[current] = f'{fields[current]} {line}'.strip() if current in fields else line
+        text = ' '.join(fields.values())
+        rec = fields.get('recomendaciones', '')
+        llegar = re.search(r'C[oó]mo llegar[^:]*:\s*(.*?)(?=Qu[eé] llevar|$)', rec)
+        llevar = re.search(r'Qu[eé] llevar:\s*(.*)', rec)
+        if llegar:
+            fields['llegar'] = llegar.group(1).strip()
+        if llevar:
+            fields['llevar'] = llevar.group(1).strip()
+        passages.append(Passage('lugares', match.group(1), text, fields))
+    return passages
+
+
+def _species_passages():
+    from contentservice.models import SpeciesProfile
+    passages, seen = [], set()
+    # Una ficha por especie y lugar: se indexa solo la más reciente de cada especie
+    rows = SpeciesProfile.objects.order_by('scientific_name', '-refreshed_at').values_list(
+        'scientific_name', 'common_name', 'family', 'kingdom', 'conservation_status', 'description')
+    for scientific, common, family, kingdom, status, description in rows.iterator(chunk_size=1000):
+        if scientific in seen:
+            continue
+        seen.add(scientific)
+        title = f'{common} ({scientific})' if common else scientific
+        details = ', '.join(p for p in (kingdom, f'familia {family}' if family else '', f'estado {status}' if status else '') if p)
+        text = ' '.join(p for p in (description[:800], details) if p)
+        passages.append(Passage('especies', title, text, {'descripcion': description[:400]} if description else {}))
+    return passages
+
+
+def _place_passages():
+    from userservice.models import Place
+    passages = []
+    for place in Place.objects.filter(is_active=True):
+        text = f'{place.description} {place.get_place_type_display()}. Dificultad {place.get_difficulty_display().lower()}.'
+        passages.append(Passage('lugares', place.title, text.strip(), {'descripcion': place.description} if place.description else {}))
+    return passages
+
+
+def _institution_passages():
+    from userservice.models import Institution
+    passages = []
+    for inst in Institution.objects.all():
+        fields = {}
+        if inst.address:
+            fields['ubicacion'] = inst.address
+        if inst.phone:
+            fields['telefono'] = inst.phone
+        text = ' '.join(p for p in (inst.type, inst.address, inst.phone) if p)
+        passages.append(Passage('instituciones', inst.name, text, fields))
+    return passages
+
+
+def _knowledge_version():
+    from contentservice.models import SpeciesProfile
+    from userservice.models import Institution, Place
+    try:
+        doc_mtime = DOCS_PATH.stat().st_mtime_ns
+    except OSError:
+        doc_mtime = None
+    return (
+        tuple(SpeciesProfile.objects.aggregate(n=Count('pk'), t=Max('refreshed_at')).values()),
+        tuple(Place.objects.aggregate(n=Count('pk'), t=Max('updated_at')).values()),
+        tuple(Institution.objects.aggregate(n=Count('pk'), t=Max('pk')).values()),
+        doc_mtime,
+    )
+
+
+def _build():
+    passages = _doc_passages(DOCS_PATH)
+    for loader in (_place_passages, _institution_passages, _species_passages):
+        try:
+            passages += loader()
+        except Exception:
+            # Tabla sin migrar o base no disponible: se indexa lo demás
+            continue
+    return BM25Index(passages)
+
+
+_lock = threading.Lock()
+_index = None
+_built_at = 0.0
+_version = None
+
+
+def get_index():
+    global _index, _built_at, _version
+    if _index is not None and time.monotonic() - _built_at < REFRESH_SECONDS:
+        return _index
+    with _lock:
+        if _index is None or time.monotonic() - _built_at >= REFRESH_SECONDS:
+            try:
+                version = _knowledge_version()
+            except Exception:
+                version = None
+            if _index is None or version != _version:
+                _index = _build()
+                _version = version
+            _built_at = time.monotonic()
+    return _index
+
+
+def search(query, k=TOP_K):
+    return get_index().search(query, k)
+
+
+def lookup(query):
+    """(pasajes, respuesta directa o None); sin índice disponible se sigue sin contexto."""
+    try:
+        results = search(query)
+    except Exception:
+        return [], None
+    return results, faq_answer(query, results)
+
+
+def context_block(results, max_chars=CONTEXT_CHARS):
+    """Pasajes para el prompt de sistema, acotados en caracteres."""
+    lines, used = [], 0
+    for _, passage in results:
+        line = f'- {passage.title}: {passage.text}'
+        line = line[:max(0, max_chars - used)]
+        if len(line) < 40:
+            break
+        lines.append(line)
+        used += len(line)
+    if not lines:
+        return ''
+    return 'Información local verificada de Tingo María (úsala si es pertinente, no inventes datos):\n' + '\n'.join(lines)
+
+
+def with_context(system_prompt, results):
+    block = context_block(results)
+    return f'{system_prompt}\n\n{block}' if block else system_prompt
+
+
+def _coverage(title_tokens, query_tokens):
+    return len(title_tokens & query_tokens) / len(title_tokens) if title_tokens else 0.0
+
+
+def faq_answer(query, results):
+    """
+    Respuesta directa cuando la pregunta nombra claramente un lugar o
+    institución del índice y pide uno de sus campos (horario, teléfono...).
+    """
+    tokens = set(tokenize(query))
+    wanted = [field for field, words in INTENTS.items() if tokens & set(words)]
+    if not wanted:
+        return None
+    ranked = sorted(
+        ((_coverage(set(tokenize(p.title)), tokens), score, p) for score, p in results if score >= FAQ_MIN_SCORE),
+        key=lambda item: (item[0], item[1]),
+        reverse=True,
+    )
+    if not ranked or ranked[0][0] < FAQ_TITLE_COVERAGE:
+        return None
+    # Dos pasajes nombrados igual de bien: ambiguo, mejor que responda el modelo
+    if len(ranked) > 1 and ranked[1][0] == ranked[0][0]:
+        return None
+    passage = ranked[0][2]
+    for field in wanted:
+        if passage.fields.get(field):
+            return f'{passage.title}: {passage.fields[field]}'
+    return None
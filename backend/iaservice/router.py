@@ -0,0 +1,422 @@
+"""
+Enrutador de backends de LLM (Groq y Ollama).
+
+Cada backend tiene un circuit breaker y una ventana de latencias recientes.
+``complete`` ordena los backends por salud, lanza el primero y, si no
+responde antes de su p95 reciente (acotado), lanza en paralelo el siguiente:
+gana la primera respuesta válida. Un hilo en segundo plano sondea los
+backends y deja el resultado en caché para ``/llm/health``.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from typing import NamedTuple
+
+from naturein import http_client
+
+from . import llm
+from .admission import FairLimiter, Overloaded
+
+
+FAILURE_THRESHOLD = int(os.environ.get('LLM_BREAKER_FAILURES', '3'))
+COOLDOWN = float(os.environ.get('LLM_BREAKER_COOLDOWN', '30'))
+REQUEST_TIMEOUT = float(os.environ.get('LLM_REQUEST_TIMEOUT', '30'))
+HEDGE_MIN = float(os.environ.get('LLM_HEDGE_MIN_DELAY', '0.5'))
+HEDGE_MAX = float(os.environ.get('LLM_HEDGE_MAX_DELAY', '5'))
+HEDGE_DEFAULT = 2.0
+HEALTH_INTERVAL = float(os.environ.get('LLM_HEALTH_INTERVAL', '30'))
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 5
+
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('LLM_ROUTER_WORKERS', '8')), thread_name_prefix='llm-router')
+
+
+class RouterError(Exception):
+    pass
+
+
+class Attempt:
+    """Un intento de ``complete``: su cupo y la señal para abortarlo si otro backend gana."""
+
+    def __init__(self, reservation=None):
+        self.reservation = reservation
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+        # El cupo se devuelve ya; la generación se corta en el próximo fragmento
+        if self.reservation is not None:
+            self.reservation.release()
+
+
+class Completion(NamedTuple):
+    text: str
+    backend: str
+    latency_ms: float
+
+
+class CircuitBreaker:
+    def __init__(self, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def available(self):
+        with self._lock:
+            if self.state == 'open':
+                return time.monotonic() - self.opened_at >= self.cooldown
+            return self.state == 'closed' or not self._trial
+
+    def acquire(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = 'half_open'
+                self._trial = False
+            if self.state == 'half_open' and not self._trial:
+                # Un solo intento de prueba mientras está medio abierto
+                self._trial = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._trial = False
+
+    def abandon(self):
+        # Intento abortado sin veredicto: se libera el turno de prueba
+        with self._lock:
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+class Backend:
+    def __init__(self, name, model, complete, stream, probe, limiter=None):
+        self.name = name
+        self.model = model
+        self._complete = complete
+        self._stream = stream
+        self._probe = probe
+        self.limiter = limiter
+        self.breaker = CircuitBreaker()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'errors': 0, 'hedged': 0, 'hedges_skipped': 0, 'wins': 0, 'cancelled': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def percentile(self, q):
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def _admit(self, client):
+        return self.limiter.slot(client) if self.limiter else nullcontext()
+
+    def complete(self, messages, options, client=None, attempt=None):
+        attempt = attempt or Attempt()
+        if attempt.reservation is None and self.limiter:
+            attempt.reservation = self.limiter.reserve(client)
+        with attempt.reservation or nullcontext():
+            if attempt.cancelled.is_set():
+                raise llm.Cancelled(f'{self.name}: cancelado')
+            if not self.breaker.acquire():
+                raise RouterError(f'{self.name}: circuito abierto')
+            self._count('requests')
+            start = time.monotonic()
+            try:
+                text = self._complete(messages, options, attempt.cancelled)
+                if not text:
+                    raise RouterError(f'{self.name}: respuesta vacía')
+            except llm.Cancelled:
+                # Perdió contra otro backend: no cuenta como falla
+                self._count('cancelled')
+                self.breaker.abandon()
+                raise
+            except Exception:
+                self._count('errors')
+                self.breaker.failure()
+                raise
+            elapsed = time.monotonic() - start
+        with self._lock:
+            self._latencies.append(elapsed)
+        self.breaker.success()
+        return Completion(text, self.name, round(elapsed * 1000, 1))
+
+    def reserve(self, client):
+        """Cupo pedido de antemano (puede lanzar Overloaded); None si el backend no tiene cola."""
+        return self.limiter.reserve(client) if self.limiter else None
+
+    def stream(self, messages, options, client=None, reservation=None):
+        # El cupo se mantiene mientras dura el stream y se libera al cerrarlo
+        with reservation or self._admit(client):
+            if not self.breaker.acquire():
+                raise RouterError(f'{self.name}: circuito abierto')
+            self._count('requests')
+            started = False
+            try:
+                for delta in self._stream(messages, options):
+                    started = True
+                    yield delta
+            except Exception:
+                self._count('errors')
+                if not started:
+                    self.breaker.failure()
+                raise
+            self.breaker.success()
+
+    def stats(self):
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        with self._lock:
+            counters = dict(self.counters)
+        if self.limiter:
+            counters['queue'] = self.limiter.stats()
+        return {
+            **counters,
+            'model': self.model,
+            'state': self.breaker.state,
+            'failures': self.breaker.failures,
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+def _groq_probe():
+    r = http_client.get('https://api.groq.com/openai/v1/models', headers={'Authorization': f"Bearer {os.environ.get('GROQ_API_KEY')}"}, timeout=5)
+    r.raise_for_status()
+    return [m.get('id') for m in (r.json().get('data') or [])]
+
+
+def _ollama_probe():
+    r = http_client.get(f'{llm.ollama_base()}/api/tags', timeout=5)
+    r.raise_for_status()
+    return [t.get('name') for t in (r.json().get('models') or [])]
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def backends():
+    """Backends configurados, en orden de preferencia; se crean una sola vez por configuración."""
+    groq_key = os.environ.get('GROQ_API_KEY')
+    wanted = []
+    if groq_key:
+        wanted.append(('groq', llm.groq_model()))
+    wanted.append(('ollama', llm.ollama_model()))
+    with _backends_lock:
+        result = []
+        for name, model in wanted:
+            backend = _backends.get((name, model))
+            if backend is None:
+                if name == 'groq':
+                    backend = Backend(
+                        name, model,
+                        complete=lambda msgs, opts, cancel, m=model: llm.groq_complete(msgs, os.environ.get('GROQ_API_KEY'), m, timeout=REQUEST_TIMEOUT),
+                        stream=lambda msgs, opts, m=model: llm.groq_stream(msgs, os.environ.get('GROQ_API_KEY'), m),
+                        probe=_groq_probe,
+                    )
+                else:
+                    backend = Backend(
+                        name, model,
+                        complete=lambda msgs, opts, cancel, m=model: llm.ollama_complete(msgs, opts, m, timeout=REQUEST_TIMEOUT, cancel=cancel),
+                        stream=lambda msgs, opts, m=model: llm.ollama_stream(msgs, opts, m),
+                        probe=_ollama_probe,
+                        # Inferencia local en CPU: pocas generaciones a la vez
+                        limiter=FairLimiter(),
+                    )
+                _backends[(name, model)] = backend
+            result.append(backend)
+    return result
+
+
+def model_label():
+    return '|'.join(f'{b.name}:{b.model}' for b in backends())
+
+
+def ranked():
+    """Backends que el breaker deja pasar, los más rápidos primero."""
+    candidates = backends()
+    state_rank = {'closed': 0, 'half_open': 1, 'open': 2}
+
+    def key(item):
+        index, backend = item
+        p50 = backend.percentile(0.5)
+        # Sin muestras suficientes se respeta el orden configurado
+        return (state_rank[backend.breaker.state], p50 is None, p50 or 0, index)
+    return [b for _, b in sorted(enumerate(candidates), key=key) if b.breaker.available()]
+
+
+def hedge_delay(backend):
+    p95 = backend.percentile(0.95)
+    return HEDGE_DEFAULT if p95 is None else min(HEDGE_MAX, max(HEDGE_MIN, p95))
+
+
+def complete(messages, options=None, client=None):
+    """
+    Devuelve la primera respuesta válida. Lanza Overloaded si todos los
+    backends rechazaron por cola llena y RouterError si fallaron.
+    """
+    queue = ranked()
+    if not queue:
+        raise RouterError('No hay backends de LLM disponibles')
+    pending = {}
+    errors = []
+    overloaded = []
+
+    def launch(backend, hedged=False):
+        attempt = Attempt()
+        if hedged:
+            # Un respaldo con cola solo se lanza si tiene cupo libre ahora: no se encola
+            # ni ocupa el único cupo de Ollama para una respuesta que quizá se descarte
+            if backend.limiter:
+                attempt.reservation = backend.limiter.try_reserve()
+                if attempt.reservation is None:
+                    backend._count('hedges_skipped')
+                    return False
+            backend._count('hedged')
+        pending[_executor.submit(backend.complete, messages, options, client, attempt)] = (backend, attempt)
+        return True
+
+    def hedge():
+        for i, backend in enumerate(queue):
+            if launch(backend, hedged=True):
+                del queue[i]
+                return
+
+    launch(queue.pop(0))
+    try:
+        while pending:
+            primary = next(iter(pending.values()))[0]
+            timeout = hedge_delay(primary) if queue else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # El primero tarda más que su p95: se compite con el siguiente que tenga cupo
+                hedge()
+                continue
+            for future in done:
+                backend, _ = pending.pop(future)
+                try:
+                    result = future.result()
+                except Overloaded as exc:
+                    overloaded.append(exc)
+                    continue
+                except Exception as exc:
+                    errors.append(f'{backend.name}: {exc}')
+                    continue
+                backend._count('wins')
+                return result
+            if not pending and queue:
+                launch(queue.pop(0))
+    finally:
+        # Los que pierden no siguen en la cola del executor ni retienen su cupo
+        for future, (_, attempt) in pending.items():
+            future.cancel()
+            attempt.cancel()
+    if overloaded and not errors:
+        raise Overloaded(min(exc.retry_after for exc in overloaded))
+    raise RouterError('; '.join(errors) or 'Sin respuesta de los backends de LLM')
+
+
+def stream_events(messages, options=None, client=None, **sse_options):
+    """
+    Eventos de ``llm.sse_stream`` con los backends en orden de salud. El cupo
+    del primero, si tiene cola, se pide antes de devolver el generador: la
+    vista puede responder 429 en lugar de abrir el stream. Lanza Overloaded
+    si ese era el único backend.
+    """
+    queue = ranked()
+    reservation = None
+    if queue and queue[0].limiter:
+        try:
+            reservation = queue[0].reserve(client)
+        except Overloaded:
+            if len(queue) == 1:
+                raise
+            queue.pop(0)
+    sources = [
+        (b.name, lambda b=b, r=(reservation if i == 0 else None): b.stream(messages, options, client, r))
+        for i, b in enumerate(queue)
+    ]
+    return _releasing(llm.sse_stream(sources, **sse_options), reservation)
+
+
+def _releasing(events, reservation):
+    # El cupo se libera aunque el stream se corte antes de abrir el backend
+    try:
+        yield from events
+    finally:
+        if reservation is not None:
+            reservation.release()
+
+
+_health = {'checked_at': None, 'backends': {}}
+_health_lock = threading.Lock()
+_probe_thread = None
+
+
+def probe():
+    results = {}
+    for backend in backends():
+        try:
+            models = backend._probe()
+            results[backend.name] = {'available': True, 'models': models, 'model': backend.model}
+            if backend.breaker.state == 'open':
+                # Responde de nuevo: se permite un intento sin esperar todo el enfriamiento
+                backend.breaker.opened_at = 0.0
+        except Exception:
+            results[backend.name] = {'available': False, 'models': [], 'model': backend.model}
+    with _health_lock:
+        _health['backends'] = results
+        _health['checked_at'] = time.time()
+    return results
+
+
+def _probe_loop():
+    while True:
+        time.sleep(HEALTH_INTERVAL)
+        try:
+            probe()
+        except Exception:
+            pass
+
+
+def health():
+    """Último sondeo de los backends; el primero se hace en línea y luego en segundo plano."""
+    global _probe_thread
+    with _health_lock:
+        start = _probe_thread is None
+        if start:
+            _probe_thread = threading.Thread(target=_probe_loop, name='llm-health-probe', daemon=True)
+        snapshot = dict(_health)
+    if start:
+        probe()
+        _probe_thread.start()
+        with _health_lock:
+            snapshot = dict(_health)
+    return snapshot
+
+
+def stats():
+    return {b.name: b.stats() for b in backends()}
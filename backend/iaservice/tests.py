@@ -0,0 +1,60 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from iaservice import llm, router
+from iaservice.admission import FairLimiter
+
+
+def _fast(messages, options, cancel):
+    time.sleep(0.2)
+    return 'respuesta rápida'
+
+
+class HedgeTests(SimpleTestCase):
+    def setUp(self):
+        self.hedge_started = threading.Event()
+        self.hedge_stopped = threading.Event()
+        self.primary = router.Backend('groq', 'm', complete=_fast, stream=None, probe=None)
+        self.local = router.Backend('ollama', 'm', complete=self._slow_local, stream=None, probe=None,
+                                    limiter=FairLimiter(limit=1, max_queue=4, max_wait=5))
+        patches = [
+            mock.patch.object(router, 'ranked', return_value=[self.primary, self.local]),
+            mock.patch.object(router, 'HEDGE_DEFAULT', 0.05),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _slow_local(self, messages, options, cancel):
+        # Simula una generación larga que se corta entre fragmentos
+        self.hedge_started.set()
+        try:
+            for _ in range(100):
+                if cancel.is_set():
+                    raise llm.Cancelled('cancelado')
+                time.sleep(0.05)
+            return 'respuesta local'
+        finally:
+            self.hedge_stopped.set()
+
+    def test_losing_hedge_releases_the_limiter(self):
+        result = router.complete([{'role': 'user', 'content': 'hola'}])
+        self.assertEqual(result.backend, 'groq')
+        self.assertTrue(self.hedge_started.is_set())
+        self.assertEqual(self.local.limiter.stats()['active'], 0)
+        # La generación descartada se aborta en vez de llegar al final
+        self.assertTrue(self.hedge_stopped.wait(1))
+        self.assertEqual(self.local.counters['cancelled'], 1)
+        self.assertEqual(self.local.breaker.state, 'closed')
+
+    def test_hedge_skipped_when_limiter_is_saturated(self):
+        held = self.local.limiter.reserve('otro')
+        self.addCleanup(held.release)
+        result = router.complete([{'role': 'user', 'content': 'hola'}])
+        self.assertEqual(result.backend, 'groq')
+        self.assertFalse(self.hedge_started.is_set())
+        self.assertGreaterEqual(self.local.counters['hedges_skipped'], 1)
+        self.assertEqual(self.local.limiter.stats()['active'], 1)
@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import ia_chat
+from .views import ia_chat, ia_metrics
 
 urlpatterns = [
     path('chat/', ia_chat),
+    path('metrics/', ia_metrics),
 ]
@@ -1,17 +1,15 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-import os, requests
+from . import llm, retrieval, router
+from .admission import client_key, overloaded_response
+from .answer_cache import answers, prompt_version
 
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def ia_chat(request):
     user_message = request.data.get("message", "")
-    api_key = os.environ.get("GROQ_API_KEY")
-
-    if not api_key:
-        return Response({"error": "API key no encontrada"}, status=500)
 
     try:
         role = request.user.role.role
@@ -29,34 +27,48 @@ def ia_chat(request):
     }
     system_prompt = role_prompts.get(role, role_prompts["student"])
 
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    model = os.environ.get("GROQ_MODEL", "llama-3.1-8b-instant")
-    data = {
-        "model": model,
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_message}
-        ]
-    }
+    model = router.model_label()
+    client = client_key(request)
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_message}
+    ]
+    version = prompt_version(system_prompt)
+    cached = answers.get(role, version, user_message, model)
+    stream = llm.wants_stream(request)
+    if cached is not None:
+        message = {"role": "assistant", "content": cached}
+        if stream:
+            return llm.sse_response(llm.sse_cached(cached))
+        return Response({"choices": [{"message": message}], "cached": True})
+
+    passages, faq = retrieval.lookup(user_message)
+    if faq:
+        if stream:
+            return llm.sse_response(llm.sse_cached(faq, 'faq'))
+        return Response({"choices": [{"message": {"role": "assistant", "content": faq}}], "source": "faq"})
+    messages[0]["content"] = retrieval.with_context(system_prompt, passages)
+
+    def remember(reply):
+        answers.set(role, version, user_message, model, reply)
+
+    if stream:
+        try:
+            return llm.sse_response(router.stream_events(messages, client=client, on_done=remember))
+        except router.Overloaded as exc:
+            return overloaded_response(exc)
 
     try:
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        groq_data = response.json()
-
-        if "choices" in groq_data and len(groq_data["choices"]) > 0:
-            message = groq_data["choices"][0].get("message", {
-                "role": "assistant",
-                "content": "No se recibió respuesta válida del modelo."
-            })
-        else:
-            message = {"role": "assistant", "content": "No se recibió respuesta válida del modelo."}
-
-        return Response({"choices": [{"message": message}]})
-
-    except requests.exceptions.RequestException as e:
-        return Response({"error": f"Error al conectar con Groq: {str(e)}"}, status=500)
+        result = router.complete(messages, client=client)
+    except router.Overloaded as exc:
+        return overloaded_response(exc)
+    except router.RouterError as e:
+        return Response({"error": f"Error al conectar con el modelo: {str(e)}"}, status=500)
+    remember(result.text)
+    return Response({"choices": [{"message": {"role": "assistant", "content": result.text}}], "backend": result.backend})
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def ia_metrics(request):
+    return Response({'answer_cache': answers.stats(), 'llm': llm.stats(), 'backends': router.stats()})
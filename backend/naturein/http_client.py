@@ -0,0 +1,191 @@
+"""
+Cliente HTTP compartido para las APIs externas (iNaturalist, GBIF, Wikipedia,
+Wikidata, EOL, Groq, Ollama).
+
+Todas las sesiones del proceso montan el mismo ``HTTPAdapter``: las conexiones
+keep-alive se reutilizan por host y el handshake TCP+TLS sale del camino
+crítico. Cada hilo usa su propia ``requests.Session`` (no son thread-safe).
+
+Una petición entrante puede fijar un presupuesto de tiempo con ``budget``: el
+timeout de cada llamada se recorta a lo que queda y, agotado, las llamadas
+siguientes fallan sin salir a la red. El presupuesto viaja en una contextvar,
+así que ``fan_out`` lo propaga a sus hilos.
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+
+
+DEFAULT_TIMEOUT = 5
+
+
+class _DeadlineRetry(Retry):
+    """
+    Con un presupuesto activo no se reintenta si el intento siguiente (backoff
+    + timeout del intento) no cabe en lo que queda: el plazo es duro.
+    """
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        deadline = _budget.get()
+        if deadline is not None and deadline.remaining() < retry.get_backoff_time() + getattr(_local, 'attempt_timeout', 0):
+            raise MaxRetryError(_pool, url, error or ResponseError('sin tiempo para reintentar'))
+        return retry
+
+
+# Reintentos acotados con backoff exponencial; solo para métodos idempotentes.
+# Solo errores de conexión y estados 429/5xx: un timeout de lectura no se repite
+# (multiplicaría la espera de las llamadas sin presupuesto de tiempo)
+_retry = _DeadlineRetry(
+    total=int(os.environ.get('HTTP_CLIENT_RETRIES', '2')),
+    read=False,
+    backoff_factor=0.3,
+    backoff_max=2,
+    status_forcelist=(429, 502, 503, 504),
+    allowed_methods=frozenset({'GET', 'HEAD'}),
+    respect_retry_after_header=False,
+    raise_on_status=False,
+)
+_adapter = HTTPAdapter(
+    pool_connections=int(os.environ.get('HTTP_CLIENT_HOSTS', '16')),
+    pool_maxsize=int(os.environ.get('HTTP_CLIENT_POOL_SIZE', '32')),
+    max_retries=_retry,
+)
+_local = threading.local()
+_budget = contextvars.ContextVar('http_budget', default=None)
+_lock = threading.Lock()
+_counters = defaultdict(lambda: {'requests': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+
+
+def _session():
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.mount('https://', _adapter)
+        session.mount('http://', _adapter)
+        _local.session = session
+    return session
+
+
+def _record(host, elapsed_ms, error):
+    with _lock:
+        c = _counters[host]
+        c['requests'] += 1
+        c['errors'] += int(error)
+        c['total_ms'] += elapsed_ms
+        c['max_ms'] = max(c['max_ms'], elapsed_ms)
+
+
+class DeadlineExceeded(requests.Timeout):
+    pass
+
+
+class Budget:
+    """Tiempo total de una petición y lo que consumió cada host externo."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+        # Alguna tarea quedó sin hacer por falta de tiempo
+        self.exhausted = False
+        self._lock = threading.Lock()
+        self._timings = defaultdict(lambda: {'requests': 0, 'errors': 0, 'ms': 0.0})
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    def clamp(self, timeout):
+        remaining = self.remaining()
+        if remaining <= 0:
+            self.exhausted = True
+            raise DeadlineExceeded('presupuesto de tiempo agotado')
+        if isinstance(timeout, tuple):
+            return tuple(min(t, remaining) if t is not None else remaining for t in timeout)
+        return min(timeout, remaining) if timeout is not None else remaining
+
+    def record(self, host, elapsed_ms, error):
+        with self._lock:
+            t = self._timings[host]
+            t['requests'] += 1
+            t['errors'] += int(error)
+            t['ms'] += elapsed_ms
+
+    def record_shared_error(self, host):
+        """Error de una llamada ajena compartida (singleflight): cuenta, sin tiempo propio."""
+        with self._lock:
+            self._timings[host]['errors'] += 1
+
+    @property
+    def errors(self):
+        with self._lock:
+            return sum(t['errors'] for t in self._timings.values())
+
+    def timings(self):
+        with self._lock:
+            return {host: dict(t, ms=round(t['ms'], 1)) for host, t in self._timings.items()}
+
+
+@contextmanager
+def budget(seconds):
+    current = Budget(seconds)
+    token = _budget.set(current)
+    try:
+        yield current
+    finally:
+        _budget.reset(token)
+
+
+def current_budget():
+    return _budget.get()
+
+
+def request(method, url, **kwargs):
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    host = urlsplit(url).netloc
+    deadline = _budget.get()
+    if deadline is not None:
+        kwargs['timeout'] = deadline.clamp(kwargs['timeout'])
+        # Peor caso de un intento, para que _DeadlineRetry decida si cabe otro
+        timeout = kwargs['timeout']
+        _local.attempt_timeout = sum(t for t in timeout if t) if isinstance(timeout, tuple) else timeout
+    start = time.monotonic()
+    try:
+        response = _session().request(method, url, **kwargs)
+    except Exception:
+        elapsed = (time.monotonic() - start) * 1000
+        _record(host, elapsed, True)
+        if deadline is not None:
+            deadline.record(host, elapsed, True)
+        raise
+    elapsed = (time.monotonic() - start) * 1000
+    _record(host, elapsed, response.status_code >= 500)
+    if deadline is not None:
+        deadline.record(host, elapsed, response.status_code >= 500)
+    return response
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def stats():
+    with _lock:
+        data = {host: dict(c) for host, c in _counters.items()}
+    for c in data.values():
+        c['avg_ms'] = round(c['total_ms'] / c['requests'], 1) if c['requests'] else None
+        c['total_ms'] = round(c['total_ms'], 1)
+        c['max_ms'] = round(c['max_ms'], 1)
+    return data
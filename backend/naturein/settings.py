@@ -112,6 +112,38 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Caché de consultas a servicios externos (iNaturalist, GBIF, Wikipedia, Wikidata, EOL)
+# SQLite local para compartirla entre workers de gunicorn y sobrevivir reinicios;
+# desalojo LRU sin recorrer el directorio en cada escritura
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'upstream': {
+        'BACKEND': 'naturein.sqlite_cache.SQLiteCache',
+        'LOCATION': os.path.join(os.environ.get('UPSTREAM_CACHE_DIR', str(BASE_DIR / 'cache' / 'upstream')), 'upstream.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('UPSTREAM_CACHE_MAX_ENTRIES', '20000')),
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+# TTL en segundos por fuente; las respuestas vacías usan el TTL negativo
+UPSTREAM_CACHE_DEFAULT_TTL = int(os.environ.get('UPSTREAM_CACHE_TTL', '86400'))
+UPSTREAM_CACHE_NEGATIVE_TTL = int(os.environ.get('UPSTREAM_CACHE_NEGATIVE_TTL', '900'))
+UPSTREAM_CACHE_TTLS = {
+    'inat': UPSTREAM_CACHE_DEFAULT_TTL,
+    'gbif': 7 * 86400,
+    'wikipedia': UPSTREAM_CACHE_DEFAULT_TTL,
+    'wikidata': 7 * 86400,
+    'eol': 7 * 86400,
+}
+# Consultas idénticas simultáneas: cerrojos entre workers y espera máxima
+UPSTREAM_LOCK_DIR = os.environ.get('UPSTREAM_LOCK_DIR', str(BASE_DIR / 'cache' / 'upstream-locks'))
+UPSTREAM_SINGLEFLIGHT_WAIT = float(os.environ.get('UPSTREAM_SINGLEFLIGHT_WAIT', '5'))
+# Tiempo total que generate_ficha puede gastar en servicios externos
+FICHA_DEADLINE_SECONDS = float(os.environ.get('FICHA_DEADLINE_SECONDS', '3'))
+
 # WhiteNoise: solo comprimir en producción para evitar errores en desarrollo
 if DEBUG:
     STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
@@ -0,0 +1,163 @@
+"""
+Backend de caché de Django sobre un archivo SQLite local.
+
+Lo comparten todos los workers del host y sobrevive reinicios, como
+``FileBasedCache``, pero escribir no recorre el directorio de la caché: cada
+``set`` es un INSERT indexado y ``set_many`` guarda todo en una transacción.
+El desalojo es LRU: las lecturas actualizan ``accessed`` y cada ``CULL_EVERY``
+escrituras se borran las entradas vencidas y, si se supera ``MAX_ENTRIES``,
+las menos usadas (hasta dejar ``MAX_ENTRIES - MAX_ENTRIES / CULL_FREQUENCY``).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+# Límite de parámetros por sentencia en versiones antiguas de SQLite
+CHUNK = 500
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+
+
+def _chunks(items):
+    for i in range(0, len(items), CHUNK):
+        yield items[i:i + CHUNK]
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = Path(location)
+        self._cull_every = int(params.get('OPTIONS', {}).get('CULL_EVERY', 100))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _conn(self):
+        # Una conexión por hilo y por proceso (los workers se crean con fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _keys(self, keys, version):
+        return {self.make_and_validate_key(key, version=version): key for key in keys}
+
+    def get_many(self, keys, version=None):
+        mapped = self._keys(keys, version)
+        if not mapped:
+            return {}
+        conn, now = self._conn(), time.time()
+        found = {}
+        for chunk in _chunks(list(mapped)):
+            marks = ','.join('?' * len(chunk))
+            rows = conn.execute(f'SELECT key, value FROM cache WHERE key IN ({marks}) AND (expires IS NULL OR expires > ?)', (*chunk, now))
+            found.update(rows.fetchall())
+        for chunk in _chunks(list(found)):
+            conn.execute(f"UPDATE cache SET accessed = ? WHERE key IN ({','.join('?' * len(chunk))})", (now, *chunk))
+        return {mapped[key]: pickle.loads(value) for key, value in found.items()}
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._conn().execute('SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time()))
+        return row.fetchone() is not None
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not data:
+            return []
+        expires, now = self.get_backend_timeout(timeout), time.time()
+        rows = [
+            (self.make_and_validate_key(key, version=version), pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires, now)
+            for key, value in data.items()
+        ]
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany('INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)', rows)
+        self._maybe_cull(len(rows))
+        return []
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires, now = self.get_backend_timeout(timeout), time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM cache WHERE key = ? AND expires <= ?', (key, now))
+            added = conn.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires, now),
+            ).rowcount == 1
+        if added:
+            self._maybe_cull(1)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cur = self._conn().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cur.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._conn().execute('DELETE FROM cache WHERE key = ?', (key,)).rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        conn = self._conn()
+        for chunk in _chunks(list(self._keys(keys, version))):
+            conn.execute(f"DELETE FROM cache WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+
+    def clear(self):
+        self._conn().execute('DELETE FROM cache')
+
+    def _maybe_cull(self, written):
+        with self._lock:
+            before = self._writes
+            self._writes += written
+            if self._writes // self._cull_every == before // self._cull_every:
+                return
+        self._cull()
+
+    def _cull(self):
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+            count = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            if count <= self._max_entries:
+                return
+            if self._cull_frequency == 0:
+                conn.execute('DELETE FROM cache')
+                return
+            keep = self._max_entries - self._max_entries // self._cull_frequency
+            conn.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (count - keep,),
+            )
+
+    def close(self, **kwargs):
+        # La conexión es por hilo y se reutiliza entre peticiones
+        pass
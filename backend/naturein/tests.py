@@ -0,0 +1,43 @@
+import socket
+import time
+
+import requests
+from django.test import SimpleTestCase
+
+from naturein import http_client
+
+
+def _unaccepting_port():
+    """Puerto que escucha con la cola llena: los connect nuevos nunca se completan."""
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(0)
+    port = server.getsockname()[1]
+    fillers = []
+    for _ in range(8):
+        filler = socket.socket()
+        filler.setblocking(False)
+        filler.connect_ex(('127.0.0.1', port))
+        fillers.append(filler)
+    return port, [server, *fillers]
+
+
+class BudgetDeadlineTests(SimpleTestCase):
+    def setUp(self):
+        self.port, sockets = _unaccepting_port()
+        for s in sockets:
+            self.addCleanup(s.close)
+
+    def _elapsed(self, seconds, **kwargs):
+        start = time.monotonic()
+        with http_client.budget(seconds):
+            with self.assertRaises(requests.RequestException):
+                http_client.get(f'http://127.0.0.1:{self.port}/', **kwargs)
+        return time.monotonic() - start
+
+    def test_connect_timeout_retries_stay_within_budget(self):
+        # Sin el límite, dos reintentos + backoff tardaban ~3.6 s con 1 s de presupuesto
+        self.assertLess(self._elapsed(1.0), 1.2)
+
+    def test_short_attempts_retry_only_while_they_fit(self):
+        self.assertLess(self._elapsed(1.0, timeout=0.3), 1.2)
@@ -4,3 +4,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'naturein.settings')
 
 application = get_wsgi_application()
+
+# Índice de autocompletado de especies listo antes de la primera petición
+from contentservice.catalog import warm_up  # noqa: E402
+warm_up()
@@ -320,6 +320,7 @@ def dashboard(request):
     Optimizado para reducir cantidad de requests del frontend
     """
     from gamifyservice.models import UserScore, UserBadge, Mission, UserProgress, Rank
+    from gamifyservice import leaderboard
     
     user = User.objects.select_related('profile', 'role').get(pk=request.user.pk)
     
@@ -376,7 +377,7 @@ def dashboard(request):
     # PosiciÃ³n en el ranking
     rank_position = None
     if user_score:
-        rank_position = UserScore.objects.filter(points__gt=user_score.points).count() + 1
+        rank_position = leaderboard.positions.position(user_score.points)
     
     gamify_info = {
         'total_points': total_points,
@@ -9,6 +9,8 @@ export default function ChatPage() {
   const [messages, setMessages] = useState<{ role: 'user' | 'assistant'; text: string }[]>([]);
   const [input, setInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  // El servidor guarda el historial: tras el primer turno solo se envía el id
+  const [conversationId, setConversationId] = useState<string | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
   // Scroll automático al último mensaje
@@ -29,8 +31,21 @@ export default function ChatPage() {
     setIsLoading(true);
 
     try {
-      const payload = { message: userMsg.text, history: messages };
-      const res = await api.post('/content/chat', payload, { timeout: 120000 });
+      const post = (id: string | null) =>
+        api.post(
+          '/content/chat',
+          id ? { message: userMsg.text, conversationId: id } : { message: userMsg.text, history: messages },
+          { timeout: 120000 },
+        );
+      let res;
+      try {
+        res = await post(conversationId);
+      } catch (e: any) {
+        // Conversación expirada en el servidor: se empieza otra con el historial local
+        if (!conversationId || e?.response?.status !== 404) throw e;
+        res = await post(null);
+      }
+      if (res.data?.conversationId) setConversationId(res.data.conversationId);
       const reply = (res.data?.reply || '').trim();
 
       if (reply) {